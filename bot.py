@@ -1,95 +1,200 @@
 # Complete Execution Coach Bot with Gemini AI Integration
-# Requirements: python-telegram-bot, sqlalchemy, python-dotenv, apscheduler, google-generativeai
+# Requirements: python-telegram-bot, sqlalchemy, asyncpg, python-dotenv, apscheduler, google-generativeai
 
 import os
+import hashlib
 import json
 import logging
+import re
+import secrets
 import signal
 import sys
+import time
+import weakref
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, NoReturn
+from uuid import uuid4
+from typing import AsyncIterator, Dict, Iterator, List, Optional, NoReturn, Tuple
 
 try:
     import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
     GEMINI_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ Google Generative AI not available: {e}")
     GEMINI_AVAILABLE = False
     genai = None
+    google_exceptions = None
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    ahocorasick = None
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+    uvloop = None
+
+from aiohttp import web
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, Float, BigInteger
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from telegram.error import BadRequest, RetryAfter, TelegramError
+from telegram.ext import AIORateLimiter, Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
+from sqlalchemy import Integer, String, DateTime, Text, Float, BigInteger, Index, bindparam, event, func, insert, select, update as sa_update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from cachetools import TTLCache
 from apscheduler.triggers.cron import CronTrigger
 import asyncio
+import asyncpg
+
+# Per-message tracing goes through logging so it costs nothing unless DEBUG is on
+logger = logging.getLogger(__name__)
+
+# Naive UTC "now", evaluated by Postgres rather than in Python
+UTC_NOW = func.timezone('utc', func.now())
+
+# User.execution_phase values, in journey order
+EXECUTION_PHASES = ('planning', 'validation', 'mvp', 'traction')
+VALID_PHASES = frozenset(EXECUTION_PHASES)
+VALID_PHASES_MSG = f"Valid phases: {', '.join(EXECUTION_PHASES)}"
 
 # Database Models
-Base = declarative_base()
+class Base(DeclarativeBase):
+    pass
 
 class User(Base):
     __tablename__ = 'users'
     
-    id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, unique=True, nullable=False)
-    username = Column(String(50))
-    first_name = Column(String(50))
-    current_business_idea = Column(Text)
-    execution_phase = Column(String(20), default='planning')  # planning, validation, mvp, traction
-    created_at = Column(DateTime, default=datetime.utcnow)
-    timezone = Column(String(50), default='UTC')
-    preferred_checkin_time = Column(String(5), default='18:00')
-    total_activities = Column(Integer, default=0)
-    last_active = Column(DateTime, default=datetime.utcnow)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True)
+    username: Mapped[Optional[str]] = mapped_column(String(50))
+    first_name: Mapped[Optional[str]] = mapped_column(String(50))
+    current_business_idea: Mapped[Optional[str]] = mapped_column(Text)
+    execution_phase: Mapped[Optional[str]] = mapped_column(String(20), default='planning')  # planning, validation, mvp, traction
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=UTC_NOW)
+    timezone: Mapped[Optional[str]] = mapped_column(String(50), default='UTC')
+    preferred_checkin_time: Mapped[Optional[str]] = mapped_column(String(5), default='18:00')
+    total_activities: Mapped[Optional[int]] = mapped_column(Integer, default=0)
+    last_active: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=UTC_NOW)
 
 class Goal(Base):
     __tablename__ = 'goals'
     
-    id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, nullable=False)
-    title = Column(String(200), nullable=False)
-    description = Column(Text)
-    target_date = Column(DateTime)
-    status = Column(String(20), default='active')  # active, completed, paused
-    created_at = Column(DateTime, default=datetime.utcnow)
-    goal_type = Column(String(20))  # weekly, monthly, milestone
-    priority = Column(Integer, default=1)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    title: Mapped[str] = mapped_column(String(200))
+    description: Mapped[Optional[str]] = mapped_column(Text)
+    target_date: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    status: Mapped[Optional[str]] = mapped_column(String(20), default='active')  # active, completed, paused
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=UTC_NOW)
+    goal_type: Mapped[Optional[str]] = mapped_column(String(20))  # weekly, monthly, milestone
+    priority: Mapped[Optional[int]] = mapped_column(Integer, default=1)
 
 class Activity(Base):
     __tablename__ = 'activities'
     
-    id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, nullable=False)
-    goal_id = Column(Integer)
-    description = Column(Text, nullable=False)
-    activity_type = Column(String(50))  # task_completed, milestone_reached, learning, blocker, win, struggle
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    mood_score = Column(Integer)  # 1-5 energy/motivation level
-    notes = Column(Text)
-    context_tags = Column(String(200))  # procrastination, impatience, breakthrough, etc.
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    goal_id: Mapped[Optional[int]] = mapped_column(Integer)
+    description: Mapped[str] = mapped_column(Text)
+    activity_type: Mapped[Optional[str]] = mapped_column(String(50))  # task_completed, milestone_reached, learning, blocker, win, struggle
+    timestamp: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=UTC_NOW)
+    mood_score: Mapped[Optional[int]] = mapped_column(Integer)  # 1-5 energy/motivation level
+    notes: Mapped[Optional[str]] = mapped_column(Text)
+    context_tags: Mapped[Optional[str]] = mapped_column(String(200))  # procrastination, impatience, breakthrough, etc.
 
 class Progress(Base):
     __tablename__ = 'progress'
     
-    id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, nullable=False)
-    metric_name = Column(String(100))  # customers_contacted, revenue, users_signed_up
-    metric_value = Column(Float)
-    date_recorded = Column(DateTime, default=datetime.utcnow)
-    notes = Column(Text)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    metric_name: Mapped[Optional[str]] = mapped_column(String(100))  # customers_contacted, revenue, users_signed_up
+    metric_value: Mapped[Optional[float]] = mapped_column(Float)
+    date_recorded: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=UTC_NOW)
+    notes: Mapped[Optional[str]] = mapped_column(Text)
 
 class Conversation(Base):
     __tablename__ = 'conversations'
     
-    id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, nullable=False)
-    message_text = Column(Text)
-    bot_response = Column(Text)
-    context_tags = Column(String(200))  # procrastination, impatience, stuck, win
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    response_type = Column(String(50))  # gemini, fallback, command
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    message_text: Mapped[Optional[str]] = mapped_column(Text)
+    bot_response: Mapped[Optional[str]] = mapped_column(Text)
+    context_tags: Mapped[Optional[str]] = mapped_column(String(200))  # procrastination, impatience, stuck, win
+    timestamp: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=UTC_NOW)
+    response_type: Mapped[Optional[str]] = mapped_column(String(50))  # gemini, fallback, command
+
+# Per-user access paths (declared here so they can use the mapped attributes)
+# Active goals for a user, highest priority first
+Index('ix_goals_user_status_priority', Goal.user_id, Goal.status, Goal.priority.desc())
+# Recent activities / streak lookups; INCLUDE lets the recent-activities
+# query be answered from the index without heap fetches
+Index(
+    'ix_activities_user_ts', Activity.user_id, Activity.timestamp.desc(),
+    postgresql_include=['description', 'activity_type']
+)
+Index('ix_conversations_user_ts', Conversation.user_id, Conversation.timestamp.desc())
+# Per-minute check-in cohort (CHECKIN_USERS_QUERY): equality on the check-in
+# hour and minute slot, then the last_active range
+Index(
+    'ix_users_checkin_slot',
+    func.substr(func.coalesce(User.preferred_checkin_time, '18:00'), 1, 2),
+    User.telegram_id % 60,
+    User.last_active
+)
+
+# Plain copies of model rows - safe to cache and share outside a session
+@dataclass(frozen=True, slots=True)
+class UserRow:
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    current_business_idea: Optional[str]
+    execution_phase: Optional[str]
+    created_at: datetime
+    total_activities: Optional[int]
+    
+    @classmethod
+    def from_model(cls, user: 'User') -> 'UserRow':
+        return cls(
+            telegram_id=user.telegram_id,
+            username=user.username,
+            first_name=user.first_name,
+            current_business_idea=user.current_business_idea,
+            execution_phase=user.execution_phase,
+            created_at=user.created_at,
+            total_activities=user.total_activities
+        )
+
+@dataclass(frozen=True, slots=True)
+class ActivityRow:
+    id: int
+    description: str
+    activity_type: Optional[str]
+    timestamp: datetime
+
+@dataclass(frozen=True, slots=True)
+class GoalRow:
+    title: str
+    target_date: Optional[datetime]
+    priority: Optional[int]
+
+@dataclass(frozen=True, slots=True)
+class ConversationRow:
+    id: int
+    message_text: Optional[str]
+    bot_response: Optional[str]
+    timestamp: datetime
 
 # Render-specific configuration
 class RenderConfig:
@@ -98,11 +203,35 @@ class RenderConfig:
         self.TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
         self.DATABASE_URL = os.getenv('DATABASE_URL')
         self.GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+        # Public HTTPS URL for webhook mode (Render sets RENDER_EXTERNAL_URL); polling is used when unset
+        self.WEBHOOK_URL = os.getenv('WEBHOOK_URL', os.getenv('RENDER_EXTERNAL_URL'))
+        self.WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+        # Fast model for interactive coaching/ideas, heavier model for market research
+        self.GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+        self.GEMINI_RESEARCH_MODEL = os.getenv('GEMINI_RESEARCH_MODEL', 'gemini-1.5-pro')
+        # Schema is managed by Alembic; set RUN_SCHEMA_CHECK=1 to create tables at startup instead
+        self.RUN_SCHEMA_CHECK = os.getenv('RUN_SCHEMA_CHECK') == '1'
+        
+        # Connection pool sizing - keep pool_size + overflow below the database's connection limit
+        self.DB_OPTIONS = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 20)),
+            'max_overflow': int(os.getenv('DB_POOL_OVERFLOW', 10)),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+            # Separate raw asyncpg pool used for read-only queries
+            'read_pool_size': int(os.getenv('DB_READ_POOL_SIZE', 20)),
+            'slow_query_ms': float(os.getenv('DB_SLOW_QUERY_MS', 500)),
+            # Set DB_PGBOUNCER=1 behind PgBouncer in transaction mode to turn off statement caching
+            'pgbouncer': os.getenv('DB_PGBOUNCER') == '1',
+        }
         
         # Render provides DATABASE_URL in specific format
         if self.DATABASE_URL and self.DATABASE_URL.startswith('postgres://'):
             # Convert postgres:// to postgresql:// for SQLAlchemy compatibility
             self.DATABASE_URL = self.DATABASE_URL.replace('postgres://', 'postgresql://', 1)
+        
+        # Use the asyncpg driver so queries don't block the event loop
+        if self.DATABASE_URL and self.DATABASE_URL.startswith('postgresql://'):
+            self.DATABASE_URL = self.DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://', 1)
     
     def validate(self):
         if not self.TELEGRAM_TOKEN:
@@ -130,175 +259,695 @@ def signal_handler(signum, frame):
 signal.signal(signal.SIGTERM, signal_handler)
 signal.signal(signal.SIGINT, signal_handler)
 
+def create_missing_indexes(connection):
+    """Add model indexes to tables created before the indexes were declared"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+# Connection-level failures worth retrying; anything else would fail again
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+class WriteBatcher:
+    """Buffers rows for one model and writes them in one transaction per batch"""
+    
+    _STOP = object()
+    FLUSH_RETRIES = 1
+    FLUSH_RETRY_DELAY = 1.0
+    
+    def __init__(self, db_manager: 'DatabaseManager', model, max_batch: int = 100, max_delay: float = 0.25):
+        self.db = db_manager
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Flush whatever is still queued, then end the background task"""
+        if self._task:
+            await self._queue.put(self._STOP)
+            await self._task
+            self._task = None
+    
+    async def put(self, row: Dict):
+        await self._queue.put(row)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            
+            # Collect up to max_batch rows or until max_delay has passed
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._write(batch)
+    
+    async def _write(self, batch: List[Dict]):
+        """Flush a batch, retrying errors that may clear up on their own before dropping it"""
+        table = self.model.__tablename__
+        for attempt in range(self.FLUSH_RETRIES + 1):
+            try:
+                await self._flush(batch)
+            except TRANSIENT_DB_ERRORS as e:
+                if attempt < self.FLUSH_RETRIES:
+                    print(f"⏳ Writing {len(batch)} {table} rows failed ({e}), retrying...")
+                    await asyncio.sleep(self.FLUSH_RETRY_DELAY)
+                    continue
+                logger.exception("Dropping %d %s rows after %d attempts", len(batch), table, attempt + 1)
+            except Exception:
+                logger.exception("Dropping %d %s rows", len(batch), table)
+            return
+    
+    async def _flush(self, rows: List[Dict]):
+        async with self.db.session_scope() as session:
+            await session.execute(insert(self.model), rows)
+            await self._after_insert(session, rows)
+        
+        # Contexts read before this commit no longer match the database
+        for user_id in {row['user_id'] for row in rows}:
+            user_data_cache.invalidate(user_id)
+    
+    async def _after_insert(self, session: AsyncSession, rows: List[Dict]):
+        """Extra writes in the same transaction as the batch insert"""
+
+class ActivityWriter(WriteBatcher):
+    """Batches activities and bumps each user's totals in the same transaction"""
+    
+    def __init__(self, db_manager: 'DatabaseManager', **kwargs):
+        super().__init__(db_manager, Activity, **kwargs)
+    
+    async def _after_insert(self, session: AsyncSession, rows: List[Dict]):
+        users = User.__table__
+        counts = Counter(row['user_id'] for row in rows)
+        
+        # One executemany UPDATE instead of a SELECT + UPDATE per activity
+        await session.execute(
+            sa_update(users)
+            .where(users.c.telegram_id == bindparam('tid'))
+            .values(
+                total_activities=func.coalesce(users.c.total_activities, 0) + bindparam('n'),
+                last_active=UTC_NOW
+            ),
+            [{'tid': user_id, 'n': n} for user_id, n in counts.items()]
+        )
+
+class QueryStats:
+    """Rolling window of recent query latencies in milliseconds"""
+    
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+    
+    def record(self, elapsed_ms: float):
+        self._samples.append(elapsed_ms)
+    
+    def percentile(self, pct: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def engine_connect_args(pgbouncer: bool) -> Dict:
+    """asyncpg connect_args for create_async_engine.
+    
+    PgBouncer in transaction mode hands each transaction a different server
+    connection, so prepared statements can't be cached or reused by name.
+    """
+    if not pgbouncer:
+        return {}
+    return {
+        'statement_cache_size': 0,
+        'prepared_statement_cache_size': 0,
+        'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__',
+    }
+
 # Database Setup
 class DatabaseManager:
-    def __init__(self, database_url: str):
-        self.engine = create_engine(database_url, pool_pre_ping=True, pool_recycle=300)
-        
-        # Handle schema migration for BigInteger telegram_id
-        self.migrate_schema()
+    # Prepared statements kept per read connection
+    READ_STATEMENT_CACHE_SIZE = 1024
+    
+    def __init__(self, database_url: str, pool_size: int = 20, max_overflow: int = 10, pool_timeout: float = 30, read_pool_size: int = 20, slow_query_ms: float = 500, pgbouncer: bool = False):
+        self.pgbouncer = pgbouncer
+        self.engine = create_async_engine(
+            database_url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=True,
+            pool_recycle=300,
+            # Reuse the most recently returned connection so surplus ones go idle
+            # and get recycled instead of all staying warm round-robin
+            pool_use_lifo=True,
+            connect_args=engine_connect_args(pgbouncer)
+        )
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.activity_writer = ActivityWriter(self)
+        self.conversation_writer = WriteBatcher(self, Conversation)
+        
+        # asyncpg takes a plain postgresql:// DSN
+        self.read_dsn = database_url.replace('postgresql+asyncpg://', 'postgresql://', 1)
+        self.read_pool_size = read_pool_size
+        self.read_pool: Optional[asyncpg.Pool] = None
+        
+        self.slow_query_ms = slow_query_ms
+        self.query_stats = QueryStats()
+        self.setup_metrics()
+    
+    def setup_metrics(self):
+        """Time every query and log slow queries and pool exhaustion"""
+        sync_engine = self.engine.sync_engine
+        
+        @event.listens_for(sync_engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+        
+        @event.listens_for(sync_engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+            self.record_query(statement, elapsed_ms)
+        
+        @event.listens_for(sync_engine.pool, 'checkout')
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            pool = sync_engine.pool
+            if pool.checkedout() >= pool.size() + pool._max_overflow:
+                print(f"⚠️ Database pool exhausted - further checkouts will wait: {pool.status()}")
+    
+    def record_query(self, statement: str, elapsed_ms: float):
+        self.query_stats.record(elapsed_ms)
+        if elapsed_ms > self.slow_query_ms:
+            print(f"🐢 Slow query ({elapsed_ms:.0f}ms): {' '.join(statement.split())[:200]}")
+    
+    def pool_status(self) -> str:
+        read_pool = (
+            f"read {self.read_pool.get_size() - self.read_pool.get_idle_size()}/{self.read_pool.get_size()} busy | "
+            if self.read_pool else ""
+        )
+        return (
+            f"{self.engine.pool.status()} | {read_pool}"
+            f"query p50 {self.query_stats.percentile(50):.0f}ms, "
+            f"p95 {self.query_stats.percentile(95):.0f}ms"
+        )
+    
+    async def init_models(self):
+        """Create missing tables and indexes - for local development only.
         
-        Base.metadata.create_all(self.engine)
-        self.SessionLocal = sessionmaker(bind=self.engine)
+        Deployments run `alembic upgrade head` instead, so a normal boot
+        doesn't touch the schema at all.
+        """
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # create_all skips tables that already exist, including their indexes
+            await conn.run_sync(create_missing_indexes)
     
-    def migrate_schema(self):
-        """Handle schema migration for BigInteger telegram_id"""
-        try:
-            # Check if we need to migrate by trying to create a test user
-            # If it fails with integer out of range, we need to drop and recreate tables
-            with self.engine.connect() as conn:
-                # Check if tables exist and if telegram_id column is the right type
-                result = conn.execute("""
-                    SELECT column_name, data_type 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'users' AND column_name = 'telegram_id'
-                """)
-                
-                row = result.fetchone()
-                if row and 'integer' in row[1] and 'bigint' not in row[1]:
-                    print("🔄 Migrating database schema for BigInteger telegram_id...")
-                    
-                    # Drop existing tables to recreate with correct schema
-                    Base.metadata.drop_all(self.engine)
-                    print("✅ Old tables dropped, recreating with BigInteger support...")
-                    
-        except Exception as e:
-            print(f"ℹ️ Schema migration check: {e}")
-            # If there's an error, it's likely the tables don't exist yet, which is fine
+    async def open_read_pool(self):
+        """Raw asyncpg pool for read-only hot paths - skips the ORM entirely"""
+        self.read_pool = await asyncpg.create_pool(
+            self.read_dsn,
+            min_size=min(5, self.read_pool_size),
+            max_size=self.read_pool_size,
+            statement_cache_size=0 if self.pgbouncer else self.READ_STATEMENT_CACHE_SIZE
+        )
+    
+    async def fetch(self, conn: asyncpg.Connection, query: str, *args) -> List[asyncpg.Record]:
+        """conn.fetch, timed into the same query stats as ORM queries"""
+        start = time.perf_counter()
+        rows = await conn.fetch(query, *args)
+        self.record_query(query, (time.perf_counter() - start) * 1000)
+        return rows
+    
+    async def dispose(self):
+        if self.read_pool is not None:
+            await self.read_pool.close()
+        await self.engine.dispose()
     
-    def get_session(self) -> Session:
+    def get_session(self) -> AsyncSession:
         return self.SessionLocal()
     
-    def get_or_create_user(self, telegram_user) -> User:
-        session = self.get_session()
+    @asynccontextmanager
+    async def session_scope(self, session: Optional[AsyncSession] = None):
+        """Unit of work on `session`, or on a new session when none is given.
+        
+        Commits on success and rolls back on error. Ending the transaction
+        returns the connection to the pool, so a per-update session doesn't
+        hold one across Gemini calls.
+        """
+        if session is None:
+            async with self.get_session() as own_session:
+                async with self.session_scope(own_session) as scoped:
+                    yield scoped
+            return
+        
         try:
-            user = session.query(User).filter_by(telegram_id=telegram_user.id).first()
-            if not user:
-                user = User(
-                    telegram_id=telegram_user.id,
-                    username=telegram_user.username,
-                    first_name=telegram_user.first_name
-                )
-                session.add(user)
-                session.commit()
-                session.refresh(user)
-            else:
-                # Update last active
-                user.last_active = datetime.utcnow()
-                session.commit()
-            return user
-        finally:
-            session.close()
+            yield session
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+    
+    async def get_or_create_user(self, telegram_user, session: Optional[AsyncSession] = None) -> User:
+        """Insert the user or bump last_active, returning the row in one round trip"""
+        stmt = (
+            pg_insert(User)
+            .values(
+                telegram_id=telegram_user.id,
+                username=telegram_user.username,
+                first_name=telegram_user.first_name
+            )
+            .on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={'last_active': UTC_NOW}
+            )
+            .returning(User)
+        )
+        async with self.session_scope(session) as session:
+            result = await session.scalars(stmt, execution_options={'populate_existing': True})
+            user = result.one()
+        return user
+
+# Longest streak we look back for when counting consecutive active days
+STREAK_LOOKBACK_DAYS = 400
+
+class UserDataCache:
+    """Process-wide TTL cache of user context data, keyed on telegram_id.
+    
+    Invalidated entries are kept a while longer as `previous` for the next
+    load, which then only fetches history rows newer than the ones it has.
+    """
+    
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60, stale_ttl: float = 600):
+        self._data = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._stale = TTLCache(maxsize=maxsize, ttl=stale_ttl)
+        self._locks = weakref.WeakValueDictionary()
+        # telegram_id -> invalidated while loading
+        self._loading: Dict[int, bool] = {}
+    
+    async def get_or_load(self, telegram_id: int, loader) -> Dict:
+        data = self._data.get(telegram_id)
+        if data is not None:
+            return data
+        
+        # One loader per user; concurrent callers wait and reuse its result
+        lock = self._locks.get(telegram_id)
+        if lock is None:
+            lock = self._locks[telegram_id] = asyncio.Lock()
+        async with lock:
+            data = self._data.get(telegram_id)
+            if data is not None:
+                return data
+            
+            self._loading[telegram_id] = False
+            try:
+                data = await loader(self._stale.get(telegram_id))
+            finally:
+                invalidated = self._loading.pop(telegram_id)
+            if data and not invalidated:
+                self._data[telegram_id] = data
+                self._stale[telegram_id] = data
+            return data
+    
+    def invalidate(self, telegram_id: int):
+        self._data.pop(telegram_id, None)
+        if telegram_id in self._loading:
+            self._loading[telegram_id] = True
+
+user_data_cache = UserDataCache()
+
+# Read-only queries for the user context, run on the raw asyncpg pool
+USER_QUERY = """
+    SELECT telegram_id, username, first_name, current_business_idea,
+           execution_phase, created_at, total_activities
+    FROM users WHERE telegram_id = $1
+"""
+RECENT_ACTIVITIES_QUERY = """
+    SELECT id, description, activity_type, timestamp FROM activities
+    WHERE user_id = $1 ORDER BY timestamp DESC, id DESC LIMIT 20
+"""
+# Keyset page: only rows added since the newest one we already hold
+NEW_ACTIVITIES_QUERY = """
+    SELECT id, description, activity_type, timestamp FROM activities
+    WHERE user_id = $1 AND id > $2 ORDER BY id DESC LIMIT 20
+"""
+ACTIVE_GOALS_QUERY = """
+    SELECT title, target_date, priority FROM goals
+    WHERE user_id = $1 AND status = 'active' ORDER BY priority DESC
+"""
+RECENT_CONVERSATIONS_QUERY = """
+    SELECT id, message_text, bot_response, timestamp FROM conversations
+    WHERE user_id = $1 ORDER BY timestamp DESC, id DESC LIMIT 10
+"""
+NEW_CONVERSATIONS_QUERY = """
+    SELECT id, message_text, bot_response, timestamp FROM conversations
+    WHERE user_id = $1 AND id > $2 ORDER BY id DESC LIMIT 10
+"""
+# Consecutive days with activity ending today ($2), computed in the database:
+# the n-th newest active day (rn = n) is part of the streak only if it is
+# exactly n - 1 days before today, so counting those rows gives the streak
+STREAK_SQL = """
+    SELECT {counts} FROM (
+        SELECT day, ROW_NUMBER() OVER (ORDER BY day DESC) AS rn
+        FROM (
+            SELECT DISTINCT timestamp::date AS day FROM activities
+            WHERE user_id = {user_id} AND timestamp::date <= $2
+            ORDER BY day DESC LIMIT $3
+        ) days
+    ) ranked
+"""
+STREAK_COUNT = "count(*) FILTER (WHERE $2 - day = rn - 1)"
+# With nothing logged today the newest day is n days back, so this counts the
+# streak that ended yesterday - the one a first activity today extends
+STREAK_THROUGH_YESTERDAY_COUNT = "count(*) FILTER (WHERE $2 - day = rn)"
+STREAK_QUERY = STREAK_SQL.format(user_id='$1', counts=f"{STREAK_COUNT}, {STREAK_THROUGH_YESTERDAY_COUNT}")
+# Users due for a check-in this minute, with their current streak
+CHECKIN_USERS_QUERY = f"""
+    SELECT u.telegram_id, u.first_name, COALESCE(u.execution_phase, 'planning') AS execution_phase,
+           ({STREAK_SQL.format(user_id='u.telegram_id', counts=STREAK_COUNT)}) AS current_streak
+    FROM users u
+    WHERE u.last_active > $1
+      AND substr(COALESCE(u.preferred_checkin_time, '18:00'), 1, 2) = $4
+      AND u.telegram_id % 60 = $5
+"""
+
+CHECKIN_TEMPLATE = """
+🌅 **Daily Check-in Time!** 
+
+Hey {first_name}! 
+
+Current streak: **{streak} days**
+Phase: **{phase_upper}**
+
+What's your 5-minute action for today? Even tiny progress counts in the {phase} phase!
+
+Reply with what you accomplished or use /stuck if you're feeling blocked. 💪
+"""
+
+def render_checkin_message(first_name: Optional[str], execution_phase: str, streak: int) -> str:
+    return CHECKIN_TEMPLATE.format(
+        first_name=first_name, streak=streak, phase=execution_phase, phase_upper=execution_phase.upper()
+    )
+
+def render_user_context(context_data: Dict) -> str:
+    """The user-context part of the coaching prompt"""
+    user = context_data.get('user')
+    recent_activities = context_data.get('recent_activities', [])
+    active_goals = context_data.get('active_goals', [])
+    
+    # Build context summary
+    activities_summary = ""
+    if recent_activities:
+        activities_summary = "Recent activities:\n" + "".join([
+            f"- {activity.description} ({activity.activity_type})\n" for activity in recent_activities[:5]
+        ])
+    
+    goals_summary = ""
+    if active_goals:
+        goals_summary = "Current goals:\n" + "".join([
+            f"- {goal.title} (due: {goal.target_date})\n" for goal in active_goals
+        ])
+    
+    business_context = f"Business idea: {user.current_business_idea}" if user and user.current_business_idea else "No business idea set yet"
+    
+    return f"""
+## USER CONTEXT:
+- Name: {user.first_name if user else 'User'}
+- {business_context}
+- Execution phase: {context_data.get('execution_phase', 'planning')}
+- Days using coach: {context_data.get('days_since_start', 0)}
+- Current streak: {context_data.get('current_streak', 0)} days
+- Total actions taken: {context_data.get('total_activities', 0)}
+
+{activities_summary}
+
+{goals_summary}
+"""
 
 # Context Manager for User State
 class UserContext:
-    def __init__(self, db_manager: DatabaseManager, user_id: int):
+    def __init__(self, db_manager: DatabaseManager, user_id: int, user: Optional[UserRow] = None):
         self.db = db_manager
         self.user_id = user_id
+        # User row the caller already has, saves re-reading it on a cache miss
+        self.user = user
         self._user_data = None
     
-    def get_user_data(self) -> Dict:
+    async def get_user_data(self) -> Dict:
+        """User context shared through user_data_cache - treat the result as read-only"""
         if self._user_data is None:
-            session = self.db.get_session()
-            try:
-                user = session.query(User).filter_by(telegram_id=self.user_id).first()
-                if not user:
-                    return {}
-                    
-                recent_activities = session.query(Activity).filter_by(
-                    user_id=self.user_id
-                ).order_by(Activity.timestamp.desc()).limit(20).all()
-                
-                active_goals = session.query(Goal).filter_by(
-                    user_id=self.user_id, status='active'
-                ).order_by(Goal.priority.desc()).all()
-                
-                recent_conversations = session.query(Conversation).filter_by(
-                    user_id=self.user_id
-                ).order_by(Conversation.timestamp.desc()).limit(10).all()
-                
-                self._user_data = {
-                    'user': user,
-                    'recent_activities': recent_activities,
-                    'active_goals': active_goals,
-                    'recent_conversations': recent_conversations,
-                    'last_checkin': self.get_last_checkin(),
-                    'current_streak': self.calculate_streak(),
-                    'execution_phase': user.execution_phase,
-                    'total_activities': user.total_activities,
-                    'days_since_start': (datetime.utcnow() - user.created_at).days
-                }
-            finally:
-                session.close()
+            self._user_data = await user_data_cache.get_or_load(self.user_id, self._load_user_data)
         return self._user_data
     
-    def get_last_checkin(self) -> Optional[datetime]:
-        session = self.db.get_session()
-        try:
-            last_activity = session.query(Activity).filter_by(
-                user_id=self.user_id
-            ).order_by(Activity.timestamp.desc()).first()
-            return last_activity.timestamp if last_activity else None
-        finally:
-            session.close()
+    async def _fetch_history(self, conn: asyncpg.Connection, row_type, previous_rows, full_query: str, new_query: str, limit: int) -> list:
+        """Newest `limit` rows; with rows from a previous load, only newer ids are fetched"""
+        if previous_rows is None:
+            return [row_type(*row) for row in await self.db.fetch(conn, full_query, self.user_id)]
+        # Rows flushed in one batch share a timestamp, so the first row isn't necessarily the newest id
+        last_seen_id = max((row.id for row in previous_rows), default=0)
+        new_rows = [row_type(*row) for row in await self.db.fetch(conn, new_query, self.user_id, last_seen_id)]
+        return (new_rows + previous_rows)[:limit]
     
-    def calculate_streak(self) -> int:
-        session = self.db.get_session()
-        try:
-            # Calculate consecutive days with activity
-            activities = session.query(Activity).filter_by(
-                user_id=self.user_id
-            ).order_by(Activity.timestamp.desc()).all()
-            
-            if not activities:
-                return 0
-            
-            streak = 0
-            current_date = datetime.now().date()
-            
-            # Group activities by date
-            activity_dates = set()
-            for activity in activities:
-                activity_dates.add(activity.timestamp.date())
-            
-            # Count consecutive days
-            check_date = current_date
-            while check_date in activity_dates:
-                streak += 1
-                check_date = check_date - timedelta(days=1)
+    async def _load_user_data(self, previous: Optional[Dict] = None) -> Dict:
+        previous = previous or {}
+        async with self.db.read_pool.acquire() as conn:
+            user = self.user
+            if user is None:
+                rows = await self.db.fetch(conn, USER_QUERY, self.user_id)
+                if not rows:
+                    return {}
+                user = UserRow(*rows[0])
             
-            return streak
-        finally:
-            session.close()
-    
-    def log_activity(self, description: str, activity_type: str, mood_score: int = None, notes: str = None, context_tags: str = None):
-        session = self.db.get_session()
-        try:
-            activity = Activity(
-                user_id=self.user_id,
-                description=description,
-                activity_type=activity_type,
-                mood_score=mood_score,
-                notes=notes,
-                context_tags=context_tags
+            recent_activities = await self._fetch_history(
+                conn, ActivityRow, previous.get('recent_activities'),
+                RECENT_ACTIVITIES_QUERY, NEW_ACTIVITIES_QUERY, 20
             )
-            session.add(activity)
-            
-            # Update user total activities
-            user = session.query(User).filter_by(telegram_id=self.user_id).first()
-            if user:
-                user.total_activities = (user.total_activities or 0) + 1
-                user.last_active = datetime.utcnow()
+            active_goals = [GoalRow(*row) for row in await self.db.fetch(conn, ACTIVE_GOALS_QUERY, self.user_id)]
+            recent_conversations = await self._fetch_history(
+                conn, ConversationRow, previous.get('recent_conversations'),
+                RECENT_CONVERSATIONS_QUERY, NEW_CONVERSATIONS_QUERY, 10
+            )
+            current_streak, streak_through_yesterday = await self.calculate_streak(conn)
             
-            session.commit()
-            self._user_data = None  # Reset cache
-        finally:
-            session.close()
+            data = {
+                'user': user,
+                'recent_activities': recent_activities,
+                'active_goals': active_goals,
+                'recent_conversations': recent_conversations,
+                # Newest activity is already loaded - no extra query needed
+                'last_checkin': recent_activities[0].timestamp if recent_activities else None,
+                'current_streak': current_streak,
+                'streak_through_yesterday': streak_through_yesterday,
+                'execution_phase': user.execution_phase,
+                'total_activities': user.total_activities,
+                'days_since_start': (datetime.utcnow() - user.created_at).days
+            }
+        # Cached with the data; writes that change it invalidate the whole entry
+        data['rendered_context'] = render_user_context(data)
+        return data
+    
+    async def calculate_streak(self, conn: asyncpg.Connection) -> Tuple[int, int]:
+        """(streak ending today, streak ending yesterday)"""
+        # Only the counts come back, not the activity days
+        rows = await self.db.fetch(conn, STREAK_QUERY, self.user_id, datetime.now().date(), STREAK_LOOKBACK_DAYS)
+        return rows[0][0], rows[0][1]
+    
+    async def log_activity(self, description: str, activity_type: str, mood_score: int = None, notes: str = None, context_tags: str = None) -> Dict:
+        # Queued for the batched writer; user totals are bumped when the batch is flushed
+        activity = {
+            'user_id': self.user_id,
+            'description': description,
+            'activity_type': activity_type,
+            'mood_score': mood_score,
+            'notes': notes,
+            'context_tags': context_tags
+        }
+        await self.db.activity_writer.put(activity)
+        self._user_data = None  # Reset cache
+        user_data_cache.invalidate(self.user_id)
+        return activity
+    
+    def append_activity_in_memory(self, context_data: Dict, activity: Dict) -> Dict:
+        """Copy of context_data including a just-logged activity, without reloading it.
+        
+        The activity may still be queued in the batched writer, so a reload
+        wouldn't see it yet anyway. The copy is not cached.
+        """
+        now = datetime.utcnow()
+        # Not written yet, so no id; the copy never feeds a keyset load
+        row = ActivityRow(id=0, description=activity['description'], activity_type=activity['activity_type'], timestamp=now)
+        
+        last_checkin = context_data.get('last_checkin')
+        active_today = last_checkin is not None and last_checkin.date() >= now.date()
+        
+        data = dict(context_data)
+        data['recent_activities'] = [row] + context_data.get('recent_activities', [])[:19]
+        data['last_checkin'] = now
+        if not active_today:
+            # current_streak only counts from today, so the first activity today extends yesterday's streak
+            data['current_streak'] = context_data.get('streak_through_yesterday', 0) + 1
+        data['total_activities'] = (context_data.get('total_activities') or 0) + 1
+        data['rendered_context'] = render_user_context(data)
+        return data
+
+# Keyword matching
+class KeywordMatcher:
+    """Finds which keyword categories occur in a text with a single scan.
+    
+    Uses an Aho-Corasick automaton when pyahocorasick is installed, otherwise
+    one precompiled regex. Keywords match as substrings, like `word in text`.
+    Each category is one bit (in declaration order) and every keyword maps to
+    the OR of its categories' bits, so a scan just ORs masks together.
+    """
+    
+    def __init__(self, categories: Dict[str, List[str]]):
+        self.bits = {category: 1 << i for i, category in enumerate(categories)}
+        word_masks: Dict[str, int] = {}
+        for category, words in categories.items():
+            for word in words:
+                word_masks[word] = word_masks.get(word, 0) | self.bits[category]
+        
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for word, mask in word_masks.items():
+                self._automaton.add_word(word, mask)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._word_masks = word_masks
+            # Lookahead so overlapping keywords are all reported
+            alternatives = '|'.join(re.escape(word) for word in sorted(word_masks, key=len, reverse=True))
+            self._pattern = re.compile(f'(?=({alternatives}))')
+    
+    def match_mask(self, text: str) -> int:
+        mask = 0
+        if self._automaton is not None:
+            for _, word_mask in self._automaton.iter(text):
+                mask |= word_mask
+        else:
+            for m in self._pattern.finditer(text):
+                mask |= self._word_masks[m.group(1)]
+        return mask
+    
+    def match(self, text: str) -> List[str]:
+        """Categories found in text, in declaration order"""
+        mask = self.match_mask(text)
+        return [category for category, bit in self.bits.items() if mask & bit]
+
+# Trigger words for fallback responses, checked in this order
+FALLBACK_TRIGGERS = {
+    'procrastination': ['procrastinating', 'avoiding', 'stuck', 'overwhelmed', 'can\'t start'],
+    'impatience': ['slow', 'not working', 'no results', 'giving up', 'frustrated'],
+    'win': ['completed', 'finished', 'done', 'achieved', 'launched', 'win'],
+}
+
+# Tags stored on each conversation, in this order
+CONTEXT_TAGS = {
+    'procrastination': ['procrastinating', 'avoiding', 'stuck', 'overwhelmed'],
+    'impatience': ['slow', 'frustrated', 'no results', 'impatient'],
+    'win': ['completed', 'finished', 'done', 'win', 'success'],
+    'customer_related': ['customer', 'client', 'user', 'sale'],
+    'financial': ['money', 'revenue', 'funding', 'investment'],
+}
+
+FALLBACK_RESPONSES = {
+    'procrastination': "I see you're feeling stuck, {name}. Your {streak}-day streak shows you CAN take action! Let's break this down: what's the smallest possible step you could take in the next 5 minutes? Even tiny progress in the {phase} phase builds momentum. 🚀",
+    'impatience': "I understand the frustration! In the {phase} phase, most solo entrepreneurs need 3-6 months to see real results. Your {streak}-day action streak is exactly how success builds - one step at a time. What would count as progress in the next 7 days? 📈",
+    'win': "🎉 Amazing work! That's day {next_day} of taking action. This is exactly how momentum builds in the {phase} phase. What felt good about completing that? And what's the next small step to keep this energy going? 💪",
+    'general': "I'm here to help you execute, {name}! You're in the {phase} phase with a {streak}-day action streak. What's on your mind? Use /stuck if you're procrastinating, /win to celebrate progress, or just tell me what you're working on! 🎯",
+}
 
 # Gemini AI Integration with Specialized Agents
+class InflightCall:
+    """Output of one Gemini call, replayed to every caller that asked for the same prompt"""
+    
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+    
+    def push(self, chunk: str):
+        self.chunks.append(chunk)
+        self._notify()
+    
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+    
+    def _notify(self):
+        # Fresh event per change, so a reader never misses one between checking and waiting
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+    
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """Chunks so far, then new ones as they arrive; a reader cancelling doesn't stop the call"""
+        seen = 0
+        while True:
+            changed = self._changed
+            while seen < len(self.chunks):
+                seen += 1
+                yield self.chunks[seen - 1]
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
 class GeminiCoach:
-    def __init__(self, api_key: str = None):
+    # In-flight Gemini requests allowed at once, and retries on rate limiting (429)
+    MAX_CONCURRENT_REQUESTS = 20
+    MAX_RETRIES = 3
+    # Coaching replies are asked to stay under 200 words; don't let them run longer
+    COACH_MAX_OUTPUT_TOKENS = 300
+    COACH_TEMPERATURE = 0.7
+    # Identical prompts (same agent, same rendered user context, same message)
+    # are answered from memory for a while instead of calling Gemini again
+    RESPONSE_CACHE_SIZE = 512
+    RESPONSE_CACHE_TTL = 600
+    # Past /research and /ideas results per user and topic, used to refine
+    # narrower follow-up topics instead of starting from scratch
+    TOPIC_CACHE_SIZE = 2048
+    TOPIC_CACHE_TTL = 3600
+    
+    def __init__(self, api_key: str = None, model_name: str = 'gemini-1.5-flash', research_model_name: str = 'gemini-1.5-pro'):
         self.api_key = api_key
+        self.research_model_name = research_model_name
+        self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        self._response_cache = TTLCache(maxsize=self.RESPONSE_CACHE_SIZE, ttl=self.RESPONSE_CACHE_TTL)
+        # Cache key -> Gemini call currently answering it, shared by identical prompts
+        self._inflight: Dict[str, InflightCall] = {}
+        # (kind, telegram_id, topic words) -> (topic, result)
+        self._topic_results = TTLCache(maxsize=self.TOPIC_CACHE_SIZE, ttl=self.TOPIC_CACHE_TTL)
+        
+        # Load specialized agent prompts (needed before the agent models are built)
+        self.load_specialized_prompts()
+        self._fallback_matcher = KeywordMatcher(FALLBACK_TRIGGERS)
+        # Keyed on the lowest set bit of the match mask, so earlier categories win
+        self._fallback_templates = {
+            self._fallback_matcher.bits[category]: FALLBACK_RESPONSES[category] for category in FALLBACK_TRIGGERS
+        }
+        self._fallback_templates[0] = FALLBACK_RESPONSES['general']
+        self.coach_model = None
+        self.ideas_model = None
+        self.research_model = None
         
         print(f"🔑 Gemini API Key provided: {'Yes' if api_key else 'No'}")
         if api_key:
@@ -313,14 +962,14 @@ class GeminiCoach:
             try:
                 genai.configure(api_key=api_key)
                 
-                # Try different model names that might work
-                model_names_to_try = [
+                # Try the configured model first, then other names that might work
+                model_names_to_try = [model_name] + [name for name in [
                     'gemini-1.5-flash',  # Latest model
                     'gemini-1.5-pro',    # Pro version  
                     'gemini-pro',        # Original
                     'models/gemini-1.5-flash',  # With models prefix
                     'models/gemini-pro'  # With models prefix
-                ]
+                ] if name != model_name]
                 
                 self.model = None
                 self.enabled = False
@@ -335,6 +984,7 @@ class GeminiCoach:
                             test_response = self.model.generate_content("Say 'test'")
                             if test_response and test_response.text:
                                 print(f"✅ Successfully configured with model: {model_name}")
+                                self.setup_agent_models(model_name)
                                 self.enabled = True
                                 self.model_name = model_name
                                 break
@@ -357,9 +1007,31 @@ class GeminiCoach:
             self.enabled = False
             self.model = None
             print("⚠️ Gemini AI disabled - no API key provided")
+    
+    def setup_agent_models(self, model_name: str):
+        """One model per agent with its static prompt bound as the system instruction"""
+        self.coach_model = genai.GenerativeModel(
+            model_name,
+            system_instruction=self.execution_coach_prompt,
+            generation_config=genai.GenerationConfig(
+                max_output_tokens=self.COACH_MAX_OUTPUT_TOKENS,
+                temperature=self.COACH_TEMPERATURE
+            )
+        )
+        self.ideas_model = genai.GenerativeModel(model_name, system_instruction=self.business_ideas_prompt)
         
-        # Load specialized agent prompts
-        self.load_specialized_prompts()
+        # Research is where answer quality matters most, so it gets the heavier model
+        research_model_name = model_name
+        if self.research_model_name and self.research_model_name != model_name:
+            try:
+                print(f"🧪 Trying research model: {self.research_model_name}")
+                test_response = genai.GenerativeModel(self.research_model_name).generate_content("Say 'test'")
+                if test_response and test_response.text:
+                    research_model_name = self.research_model_name
+            except Exception as e:
+                print(f"❌ Research model {self.research_model_name} failed, using {model_name}: {e}")
+        self.research_model = genai.GenerativeModel(research_model_name, system_instruction=self.market_research_prompt)
+        self.research_model_name = research_model_name
     
     def load_specialized_prompts(self):
         """Load the specialized agent prompts"""
@@ -477,20 +1149,132 @@ You are a specialized execution coach for solo entrepreneurs who struggle with p
 - Create demonstrable track record
 
 Always provide immediate, actionable advice that accounts for being a solo entrepreneur with limited resources.
+
+## COACHING GUIDELINES:
+- Be encouraging but realistic
+- Reference their specific history and patterns
+- Give concrete, actionable advice
+- Keep responses under 200 words
+- Use emojis sparingly but effectively
+- Address their specific challenges (procrastination, impatience, resource constraints)
+- Acknowledge progress and patterns you notice
+- If they're stuck, suggest a 5-minute micro-action
+- If they're impatient, remind them of realistic timelines for solo entrepreneurs
+- If they achieved something, celebrate and ask what they learned
+
+Provide a personalized coaching response that shows you understand their journey and current situation.
         """
 
+    @staticmethod
+    def _cache_key(model, prompt: str) -> str:
+        # The prompt carries the user's rendered context, so keys only match across
+        # users whose context renders the same (e.g. new users with no idea set)
+        return hashlib.blake2b(f"{id(model)}:{prompt}".encode(), digest_size=16).hexdigest()
+    
+    async def _generate(self, model, prompt: str) -> Optional[str]:
+        """Response text from Gemini (or the response cache), backing off when rate limited"""
+        key = self._cache_key(model, prompt)
+        cached = self._response_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        call = self._join_call(key, model, prompt, stream=False)
+        text = ''.join([chunk async for chunk in call])
+        return text or None
+    
+    async def _generate_stream(self, model, prompt: str) -> AsyncIterator[str]:
+        """Stream Gemini output chunk by chunk; only retries if nothing was yielded yet"""
+        key = self._cache_key(model, prompt)
+        cached = self._response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        async for chunk in self._join_call(key, model, prompt, stream=True):
+            yield chunk
+    
+    def _join_call(self, key: str, model, prompt: str, stream: bool) -> InflightCall:
+        """The call already answering `key`, or a new one; a non-streamed call can feed a streamed reply and vice versa"""
+        call = self._inflight.get(key)
+        if call is None:
+            call = InflightCall()
+            self._inflight[key] = call
+            call.task = asyncio.create_task(self._run_call(key, call, self._gemini_chunks(model, prompt, stream)))
+        return call
+    
+    async def _run_call(self, key: str, call: InflightCall, chunks: AsyncIterator[str]):
+        error = None
+        try:
+            async for chunk in chunks:
+                call.push(chunk)
+            if call.chunks:
+                self._response_cache[key] = ''.join(call.chunks)
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self._inflight.pop(key, None)
+            call.finish(error)
+    
+    async def _gemini_chunks(self, model, prompt: str, stream: bool) -> AsyncIterator[str]:
+        for attempt in range(self.MAX_RETRIES + 1):
+            sent = False
+            try:
+                async with self._semaphore:
+                    if not stream:
+                        response = await model.generate_content_async(prompt)
+                        if response and response.text:
+                            yield response.text
+                        return
+                    response = await model.generate_content_async(prompt, stream=True)
+                    async for chunk in response:
+                        if chunk.text:
+                            sent = True
+                            yield chunk.text
+                return
+            except google_exceptions.ResourceExhausted:
+                if sent or attempt == self.MAX_RETRIES:
+                    raise
+                delay = 2 ** attempt
+                print(f"⏳ Gemini rate limited, retrying in {delay}s...")
+                await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _topic_key(kind: str, context_data: Dict, topic: str) -> Optional[tuple]:
+        user = context_data.get('user')
+        words = tuple(topic.lower().split())
+        if not user or not words:
+            return None
+        return (kind, user.telegram_id, words)
+    
+    def _prior_result(self, key: Optional[tuple]) -> Optional[tuple]:
+        """(topic, result) cached for the longest word prefix of the key's topic, if any"""
+        if key is None:
+            return None
+        kind, telegram_id, words = key
+        for n in range(len(words) - 1, 0, -1):
+            prior = self._topic_results.get((kind, telegram_id, words[:n]))
+            if prior is not None:
+                return prior
+        return None
+    
     async def generate_business_ideas(self, context_data: Dict, user_request: str = "") -> str:
         """Generate business ideas using specialized prompt"""
         if not self.enabled or not self.model:
             return "💡 Gemini AI not available. Please check API configuration for business idea generation."
         
+        key = self._topic_key('ideas', context_data, user_request)
+        prior = self._prior_result(key)
+        if prior is not None:
+            return await self.refine_business_ideas(key, prior, user_request)
+        
         user = context_data.get('user')
         current_idea = user.current_business_idea if user else None
         phase = context_data.get('execution_phase', 'planning')
         
         full_prompt = f"""
-{self.business_ideas_prompt}
-
 ## Current Context:
 - User's current business idea: {current_idea or 'None set'}
 - Execution phase: {phase}
@@ -499,25 +1283,36 @@ Always provide immediate, actionable advice that accounts for being a solo entre
 Based on this context, provide 3-5 creative business ideas that would be suitable for a solo entrepreneur with limited resources. Focus on ideas that can be started small and validated quickly.
         """
         
-        try:
-            response = await asyncio.to_thread(self.model.generate_content, full_prompt)
-            return response.text.strip() if response and response.text else "Unable to generate ideas at the moment."
-        except Exception as e:
-            print(f"Business ideas generation error: {e}")
-            return "Unable to generate ideas at the moment. Please try again later."
+        return await self._generate_topic(self.ideas_model, key, user_request, full_prompt, "Unable to generate ideas at the moment.")
+    
+    async def refine_business_ideas(self, key: tuple, prior: tuple, user_request: str) -> str:
+        """Narrow earlier ideas for a broader request down to this one"""
+        prior_request, prior_ideas = prior
+        prompt = f"""
+## Earlier Ideas for "{prior_request}":
+{prior_ideas}
+
+## Refinement Request: {user_request}
+
+Refine these ideas for the narrower request: keep the ones that fit, adapt the rest, and keep the answer to 3-5 ideas.
+        """
+        return await self._generate_topic(self.ideas_model, key, user_request, prompt, "Unable to generate ideas at the moment.")
     
     async def conduct_market_research(self, context_data: Dict, research_topic: str) -> str:
         """Conduct market research using specialized prompt"""
         if not self.enabled or not self.model:
             return "📊 Gemini AI not available. Please check API configuration for market research."
         
+        key = self._topic_key('research', context_data, research_topic)
+        prior = self._prior_result(key)
+        if prior is not None:
+            return await self.refine_market_research(key, prior, research_topic)
+        
         user = context_data.get('user')
         current_idea = user.current_business_idea if user else None
         phase = context_data.get('execution_phase', 'planning')
         
         full_prompt = f"""
-{self.market_research_prompt}
-
 ## Research Request:
 - Topic: {research_topic}
 - User's business context: {current_idea or 'General research'}
@@ -526,96 +1321,62 @@ Based on this context, provide 3-5 creative business ideas that would be suitabl
 Provide a comprehensive market research analysis for this topic. Include market size estimates, key competitors, target customers, trends, and strategic recommendations. Keep the analysis practical for a solo entrepreneur.
         """
         
+        return await self._generate_topic(self.research_model, key, research_topic, full_prompt, "Unable to complete research at the moment.")
+    
+    async def refine_market_research(self, key: tuple, prior: tuple, research_topic: str) -> str:
+        """Narrow earlier research on a broader topic down to this one"""
+        prior_topic, prior_research = prior
+        prompt = f"""
+## Earlier Research on "{prior_topic}":
+{prior_research}
+
+## Refinement Request:
+- Narrower topic: {research_topic}
+
+Refine the earlier analysis for the narrower topic. Keep what still applies and only add what is specific to it: market size, competitors, target customers and recommendations.
+        """
+        return await self._generate_topic(self.research_model, key, research_topic, prompt, "Unable to complete research at the moment.")
+    
+    async def _generate_topic(self, model, key: Optional[tuple], topic: str, prompt: str, unavailable: str) -> str:
+        """Generate a /research or /ideas answer and remember it for narrower follow-ups"""
         try:
-            response = await asyncio.to_thread(self.model.generate_content, full_prompt)
-            return response.text.strip() if response and response.text else "Unable to complete research at the moment."
+            text = await self._generate(model, prompt)
         except Exception as e:
-            print(f"Market research error: {e}")
-            return "Unable to complete research at the moment. Please try again later."
+            print(f"Gemini {model.model_name} error: {e}")
+            return f"{unavailable} Please try again later."
+        if not text:
+            return unavailable
+        result = text.strip()
+        if key is not None:
+            self._topic_results[key] = (topic, result)
+        return result
 
     def create_coaching_prompt(self, message: str, context_data: Dict) -> str:
-        """Create a comprehensive prompt for Gemini based on user context"""
-        
-        user = context_data.get('user')
-        recent_activities = context_data.get('recent_activities', [])
-        active_goals = context_data.get('active_goals', [])
-        streak = context_data.get('current_streak', 0)
-        phase = context_data.get('execution_phase', 'planning')
-        total_activities = context_data.get('total_activities', 0)
-        days_since_start = context_data.get('days_since_start', 0)
-        
-        # Build context summary
-        activities_summary = ""
-        if recent_activities:
-            activities_summary = "Recent activities:\n"
-            for activity in recent_activities[:5]:
-                activities_summary += f"- {activity.description} ({activity.activity_type})\n"
-        
-        goals_summary = ""
-        if active_goals:
-            goals_summary = "Current goals:\n"
-            for goal in active_goals:
-                goals_summary += f"- {goal.title} (due: {goal.target_date})\n"
-        
-        business_context = f"Business idea: {user.current_business_idea}" if user and user.current_business_idea else "No business idea set yet"
-        
-        full_prompt = f"""
-{self.execution_coach_prompt}
-
-## USER CONTEXT:
-- Name: {user.first_name if user else 'User'}
-- {business_context}
-- Execution phase: {phase}
-- Days using coach: {days_since_start}
-- Current streak: {streak} days
-- Total actions taken: {total_activities}
-
-{activities_summary}
-
-{goals_summary}
-
+        """Create the per-request prompt; the coach instructions live on coach_model"""
+        # Rendered once per cache entry rather than on every message
+        rendered_context = context_data.get('rendered_context') or render_user_context(context_data)
+        return f"""{rendered_context}
 ## USER MESSAGE: "{message}"
-
-## COACHING GUIDELINES:
-- Be encouraging but realistic
-- Reference their specific history and patterns
-- Give concrete, actionable advice
-- Keep responses under 200 words
-- Use emojis sparingly but effectively
-- Address their specific challenges (procrastination, impatience, resource constraints)
-- Acknowledge progress and patterns you notice
-- If they're stuck, suggest a 5-minute micro-action
-- If they're impatient, remind them of realistic timelines for solo entrepreneurs
-- If they achieved something, celebrate and ask what they learned
-
-Provide a personalized coaching response that shows you understand their journey and current situation.
         """
-        return full_prompt
     
     async def generate_response(self, message: str, context_data: Dict) -> str:
         """Generate AI-powered coaching response"""
         
         # Debug logging
-        print(f"🤖 Gemini AI enabled: {self.enabled}")
-        print(f"📝 User message: {message[:50]}...")
+        logger.debug("🤖 Gemini AI enabled: %s, user message: %.50s", self.enabled, message)
         
         if not self.enabled or not self.model:
-            print("⚠️ Gemini AI not enabled or model not available, using fallback")
+            logger.debug("⚠️ Gemini AI not enabled or model not available, using fallback")
             return self.fallback_response(message, context_data)
         
         try:
-            print("🔄 Creating coaching prompt...")
             prompt = self.create_coaching_prompt(message, context_data)
-            print(f"📋 Prompt length: {len(prompt)} characters")
-            
-            print(f"🌐 Calling Gemini API with model: {getattr(self, 'model_name', 'unknown')}...")
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
-            print(f"📨 Gemini response received: {bool(response)}")
+            logger.debug("🌐 Calling Gemini model %s, prompt length: %s characters", getattr(self, 'model_name', 'unknown'), len(prompt))
+            text = await self._generate(self.coach_model, prompt)
             
-            if response and response.text:
-                response_text = response.text.strip()
-                print(f"✅ Gemini response length: {len(response_text)} characters")
-                print(f"🎯 First 100 chars: {response_text[:100]}...")
+            if text:
+                response_text = text.strip()
+                logger.debug("✅ Gemini response length: %s characters, first 100: %.100s", len(response_text), response_text)
                 return response_text
             else:
                 print("❌ Gemini response empty or invalid")
@@ -626,69 +1387,245 @@ Provide a personalized coaching response that shows you understand their journey
             print(f"🔍 Error type: {type(e).__name__}")
             return self.fallback_response(message, context_data)
     
+    async def stream_response(self, message: str, context_data: Dict) -> AsyncIterator[str]:
+        """Yield the coaching response as Gemini generates it"""
+        prompt = self.create_coaching_prompt(message, context_data)
+        logger.debug("🌐 Streaming Gemini response with model: %s", getattr(self, 'model_name', 'unknown'))
+        async for text in self._generate_stream(self.coach_model, prompt):
+            yield text
+    
     def fallback_response(self, message: str, context_data: Dict) -> str:
         """Fallback responses when Gemini is unavailable"""
         user = context_data.get('user')
         streak = context_data.get('current_streak', 0)
         phase = context_data.get('execution_phase', 'planning')
         
-        message_lower = message.lower()
-        
-        # Procrastination responses
-        if any(word in message_lower for word in ['procrastinating', 'avoiding', 'stuck', 'overwhelmed', 'can\'t start']):
-            return f"I see you're feeling stuck, {user.first_name if user else 'friend'}. Your {streak}-day streak shows you CAN take action! Let's break this down: what's the smallest possible step you could take in the next 5 minutes? Even tiny progress in the {phase} phase builds momentum. 🚀"
-        
-        # Impatience responses
-        if any(word in message_lower for word in ['slow', 'not working', 'no results', 'giving up', 'frustrated']):
-            return f"I understand the frustration! In the {phase} phase, most solo entrepreneurs need 3-6 months to see real results. Your {streak}-day action streak is exactly how success builds - one step at a time. What would count as progress in the next 7 days? 📈"
-        
-        # Celebration responses
-        if any(word in message_lower for word in ['completed', 'finished', 'done', 'achieved', 'launched', 'win']):
-            return f"🎉 Amazing work! That's day {streak + 1} of taking action. This is exactly how momentum builds in the {phase} phase. What felt good about completing that? And what's the next small step to keep this energy going? 💪"
-        
-        # General coaching
-        return f"I'm here to help you execute, {user.first_name if user else 'friend'}! You're in the {phase} phase with a {streak}-day action streak. What's on your mind? Use /stuck if you're procrastinating, /win to celebrate progress, or just tell me what you're working on! 🎯"
+        mask = self._fallback_matcher.match_mask(message.lower())
+        return self._fallback_templates[mask & -mask].format(
+            name=user.first_name if user else 'friend',
+            streak=streak,
+            next_day=streak + 1,
+            phase=phase
+        )
+
+def split_message(text: str, limit: int = 4000) -> Iterator[str]:
+    """Yield pieces of text no longer than limit, breaking at newlines where possible"""
+    start = 0
+    while len(text) - start > limit:
+        end = text.rfind('\n', start, start + limit)
+        if end <= start:
+            end = start + limit
+        yield text[start:end]
+        # Don't start the next piece with the newline we split on
+        start = end + 1 if text[end] == '\n' else end
+    yield text[start:]
+
+# Static command texts and message templates, built once at import
+MODES_MSG = """
+🤖 **Available Agent Modes**
+
+**🎯 EXECUTION COACH** (Default)
+*Helps with procrastination, goal-setting, and daily accountability*
+• Just send any message for coaching
+• /stuck - Get unstuck from procrastination
+• /win - Log victories and build momentum
+• /progress - See your streaks and patterns
+
+**💡 BUSINESS IDEAS GENERATOR**
+*Creates innovative, viable business concepts*
+• /ideas - Generate 3-5 creative business ideas
+• /ideas [theme] - Ideas focused on specific theme
+• Examples: `/ideas AI tools` or `/ideas local services`
+
+**📊 MARKET RESEARCHER**  
+*Provides competitive analysis and industry insights*
+• /research [topic] - Comprehensive market analysis
+• Examples: `/research food delivery apps` or `/research fitness wearables`
+
+**📋 PLANNING & GOALS**
+• /plan - Weekly planning session
+• /goal [description] - Set new goal
+• /idea [description] - Set business idea
+• /phase [planning|validation|mvp|traction] - Set execution phase
+
+All modes remember your history, goals, and patterns to provide personalized insights! 🧠
+"""
+
+PROGRESS_TEMPLATE = """
+📊 **Your Execution Progress**
+
+🔥 Current streak: **{streak} days**
+📈 Total actions: **{total_activities}**
+📅 Days as entrepreneur: **{days_since_start}**
+🚀 Phase: **{phase}**
+
+**Recent Activities:**
+{activities}
+💪 Keep building momentum! Every action counts."""
+
+DEBUG_TEMPLATE = """
+🔍 **Debug Information**
+
+**API Status:**
+• Gemini AI: {gemini_status}
+• API Key Set: {api_key_status}
+• Model Used: {model_name}
+• Research Model: {research_model}
+
+**User Context:**
+• User ID: {user_id}
+• Name: {name}
+• Streak: {streak} days
+• Phase: {phase}
+• Total Activities: {total_activities}
+• Recent Activities: {recent_activities}
+
+**Database:**
+• User Exists: {user_exists}
+• Goals: {goals}
+• Pool: {pool_status}
+
+Use /test to test Gemini AI directly.
+"""
 
 # Bot Implementation
 class ExecutionCoachBot:
-    def __init__(self, token: str, database_url: str, gemini_api_key: str = None):
-        self.db = DatabaseManager(database_url)
-        self.app = Application.builder().token(token).build()
+    # Seconds a chat's worker waits for another update before it exits
+    CHAT_WORKER_IDLE_TIMEOUT = 300
+    # Updates PTB may dispatch at once (per-chat workers keep each chat in order)
+    CONCURRENT_UPDATES = 256
+    WEBHOOK_PATH = '/telegram'
+    # Telegram allows about one edit per second per message; streamed replies
+    # are edited at most that often and only once enough new text arrived
+    STREAM_EDIT_INTERVAL = 1.1
+    STREAM_EDIT_MIN_CHARS = 120
+    # Scheduled messages in flight at once; AIORateLimiter still enforces Telegram's global limit
+    BROADCAST_CONCURRENCY = 25
+    TELEGRAM_MESSAGE_LIMIT = 4096
+    
+    def __init__(self, token: str, database_url: str, gemini_api_key: str = None, gemini_model: str = 'gemini-1.5-flash', gemini_research_model: str = 'gemini-1.5-pro', run_schema_check: bool = False, db_options: Optional[Dict] = None, webhook_url: Optional[str] = None, webhook_secret: Optional[str] = None):
+        self.db = DatabaseManager(database_url, **(db_options or {}))
+        self.run_schema_check = run_schema_check
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        
+        builder = (
+            Application.builder()
+            .token(token)
+            # Keeps all sends within Telegram's flood limits
+            .rate_limiter(AIORateLimiter())
+            .concurrent_updates(self.CONCURRENT_UPDATES)
+        )
+        if webhook_url:
+            # Updates arrive on our own web server, no long-polling updater needed
+            builder = builder.updater(None)
+        self.app = builder.build()
+        self._chat_queues: Dict[int, asyncio.Queue] = {}
+        self._chat_workers: Dict[int, asyncio.Task] = {}
         self.scheduler = AsyncIOScheduler()
-        self.gemini_coach = GeminiCoach(gemini_api_key)
+        self.gemini_coach = GeminiCoach(gemini_api_key, gemini_model, gemini_research_model)
+        self._tag_matcher = KeywordMatcher(CONTEXT_TAGS)
+        # Gemini availability is fixed once the coach is built, so pick the reply path once
+        self._reply = self.stream_reply if self.gemini_coach.enabled and self.gemini_coach.model else self.fallback_reply
         self.setup_handlers()
         self.setup_scheduler()
     
+    async def post_init(self, application: Application):
+        """Called by serve() on the bot's event loop before updates are processed"""
+        if self.run_schema_check:
+            await self.db.init_models()
+        await self.db.open_read_pool()
+        self.db.activity_writer.start()
+        self.db.conversation_writer.start()
+    
+    async def post_shutdown(self, application: Application):
+        for worker in list(self._chat_workers.values()):
+            worker.cancel()
+        await asyncio.gather(*self._chat_workers.values(), return_exceptions=True)
+        await self.db.activity_writer.stop()
+        await self.db.conversation_writer.stop()
+        await self.db.dispose()
+    
+    def per_chat(self, callback):
+        """Wrap a handler so its updates run on that chat's own worker.
+        
+        Updates within a chat stay in order, while a slow Gemini call or DB
+        write in one chat never holds up the others.
+        """
+        async def enqueue(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            chat_id = update.effective_chat.id if update.effective_chat else update.effective_user.id
+            queue = self._chat_queues.get(chat_id)
+            if queue is None:
+                queue = self._chat_queues[chat_id] = asyncio.Queue()
+                self._chat_workers[chat_id] = asyncio.create_task(self._chat_worker(chat_id, queue))
+            queue.put_nowait((callback, update, context))
+        return enqueue
+    
+    async def _chat_worker(self, chat_id: int, queue: asyncio.Queue):
+        while True:
+            try:
+                callback, update, context = await asyncio.wait_for(queue.get(), self.CHAT_WORKER_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if not queue.empty():
+                    continue
+                # Idle chat - drop the worker; the next update starts a new one
+                del self._chat_queues[chat_id]
+                del self._chat_workers[chat_id]
+                return
+            
+            try:
+                # One session for everything the handler does with this update
+                async with self.db.get_session() as session:
+                    context.chat_data['session'] = session
+                    try:
+                        await callback(update, context)
+                    finally:
+                        context.chat_data.pop('session', None)
+            except Exception as e:
+                await self.app.process_error(update, e)
+    
+    @staticmethod
+    def update_session(context: ContextTypes.DEFAULT_TYPE) -> Optional[AsyncSession]:
+        """The session opened for the update being handled"""
+        return context.chat_data.get('session')
+    
+    async def get_context(self, user_id: int, user: Optional[UserRow] = None) -> Dict:
+        """Read-only user context, served from user_data_cache when fresh"""
+        return await UserContext(self.db, user_id, user).get_user_data()
+    
     def setup_handlers(self):
         # Commands
-        self.app.add_handler(CommandHandler("start", self.start_command))
-        self.app.add_handler(CommandHandler("plan", self.weekly_planning))
-        self.app.add_handler(CommandHandler("progress", self.show_progress))
-        self.app.add_handler(CommandHandler("stuck", self.handle_stuck))
-        self.app.add_handler(CommandHandler("win", self.log_win))
-        self.app.add_handler(CommandHandler("goal", self.set_goal))
-        self.app.add_handler(CommandHandler("phase", self.set_phase))
-        self.app.add_handler(CommandHandler("idea", self.set_business_idea))
+        self.app.add_handler(CommandHandler("start", self.per_chat(self.start_command)))
+        self.app.add_handler(CommandHandler("plan", self.per_chat(self.weekly_planning)))
+        self.app.add_handler(CommandHandler("progress", self.per_chat(self.show_progress)))
+        self.app.add_handler(CommandHandler("stuck", self.per_chat(self.handle_stuck)))
+        self.app.add_handler(CommandHandler("win", self.per_chat(self.log_win)))
+        self.app.add_handler(CommandHandler("goal", self.per_chat(self.set_goal)))
+        self.app.add_handler(CommandHandler("phase", self.per_chat(self.set_phase)))
+        self.app.add_handler(CommandHandler("idea", self.per_chat(self.set_business_idea)))
         
         # Specialized Agent Commands
-        self.app.add_handler(CommandHandler("ideas", self.generate_business_ideas_command))
-        self.app.add_handler(CommandHandler("research", self.market_research_command))
-        self.app.add_handler(CommandHandler("modes", self.show_agent_modes))
+        self.app.add_handler(CommandHandler("ideas", self.per_chat(self.generate_business_ideas_command)))
+        self.app.add_handler(CommandHandler("research", self.per_chat(self.market_research_command)))
+        self.app.add_handler(CommandHandler("modes", self.per_chat(self.show_agent_modes)))
         
         # Debug Commands
-        self.app.add_handler(CommandHandler("test", self.test_gemini))
-        self.app.add_handler(CommandHandler("debug", self.debug_info))
+        self.app.add_handler(CommandHandler("test", self.per_chat(self.test_gemini)))
+        self.app.add_handler(CommandHandler("debug", self.per_chat(self.debug_info)))
         
         # Message handlers
-        self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
-        self.app.add_handler(CallbackQueryHandler(self.button_callback))
+        self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.per_chat(self.handle_message)))
+        self.app.add_handler(CallbackQueryHandler(self.per_chat(self.button_callback)))
     
     def setup_scheduler(self):
-        # Daily check-ins at 6 PM
+        # Daily check-ins: every minute, message the users due in that minute
         self.scheduler.add_job(
             self.daily_checkin,
-            CronTrigger(hour=18, minute=0),
-            id='daily_checkin'
+            CronTrigger(minute='*'),
+            id='daily_checkin',
+            # Each run is that minute's cohort's only check-in, so a late wakeup still runs it
+            misfire_grace_time=59,
+            coalesce=True
         )
         
         # Weekly planning reminder on Sunday at 10 AM
@@ -699,7 +1636,7 @@ class ExecutionCoachBot:
         )
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user = self.db.get_or_create_user(update.effective_user)
+        user = await self.db.get_or_create_user(update.effective_user, self.update_session(context))
         
         welcome_msg = f"""
 🚀 Welcome to your AI Execution Coach, {user.first_name}!
@@ -747,39 +1684,41 @@ Let's start! What's your current business idea or project?
     async def set_business_idea(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if context.args:
             idea = ' '.join(context.args)
-            session = self.db.get_session()
-            try:
-                user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
-                if user:
-                    user.current_business_idea = idea
-                    session.commit()
-                    await update.message.reply_text(f"💡 Business idea set: {idea}\n\nNow use /phase to set your current execution phase!")
-                else:
-                    await update.message.reply_text("Please use /start first to initialize your profile.")
-            finally:
-                session.close()
+            async with self.db.session_scope(self.update_session(context)) as session:
+                # One UPDATE ... RETURNING instead of loading the user first
+                user_id = await session.scalar(
+                    sa_update(User)
+                    .where(User.telegram_id == update.effective_user.id)
+                    .values(current_business_idea=idea)
+                    .returning(User.id)
+                )
+            user_data_cache.invalidate(update.effective_user.id)
+            if user_id is not None:
+                await update.message.reply_text(f"💡 Business idea set: {idea}\n\nNow use /phase to set your current execution phase!")
+            else:
+                await update.message.reply_text("Please use /start first to initialize your profile.")
         else:
             await update.message.reply_text("Usage: /idea Your business idea description")
     
     async def set_phase(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if context.args:
             phase = context.args[0].lower()
-            valid_phases = ['planning', 'validation', 'mvp', 'traction']
             
-            if phase in valid_phases:
-                session = self.db.get_session()
-                try:
-                    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
-                    if user:
-                        user.execution_phase = phase
-                        session.commit()
-                        await update.message.reply_text(f"📊 Execution phase set to: {phase.upper()}\n\nGreat! Now I can give you phase-specific coaching. What are you working on today?")
-                    else:
-                        await update.message.reply_text("Please use /start first to initialize your profile.")
-                finally:
-                    session.close()
+            if phase in VALID_PHASES:
+                async with self.db.session_scope(self.update_session(context)) as session:
+                    user_id = await session.scalar(
+                        sa_update(User)
+                        .where(User.telegram_id == update.effective_user.id)
+                        .values(execution_phase=phase)
+                        .returning(User.id)
+                    )
+                user_data_cache.invalidate(update.effective_user.id)
+                if user_id is not None:
+                    await update.message.reply_text(f"📊 Execution phase set to: {phase.upper()}\n\nGreat! Now I can give you phase-specific coaching. What are you working on today?")
+                else:
+                    await update.message.reply_text("Please use /start first to initialize your profile.")
             else:
-                await update.message.reply_text(f"Valid phases: {', '.join(valid_phases)}")
+                await update.message.reply_text(VALID_PHASES_MSG)
         else:
             await update.message.reply_text("Usage: /phase [planning|validation|mvp|traction]")
     
@@ -787,77 +1726,116 @@ Let's start! What's your current business idea or project?
         user_id = update.effective_user.id
         message_text = update.message.text
         
-        print(f"👤 Message from user {user_id}: {message_text}")
+        logger.debug("👤 Message from user %s: %s", user_id, message_text)
         
-        # Ensure user exists
-        self.db.get_or_create_user(update.effective_user)
+        # Ensure user exists; the returned row is reused if the context isn't cached
+        user = await self.db.get_or_create_user(update.effective_user, self.update_session(context))
         
         # Get user context
-        user_context = UserContext(self.db, user_id)
-        context_data = user_context.get_user_data()
+        context_data = await self.get_context(user_id, UserRow.from_model(user))
         
         # Debug context
-        print(f"📊 Context loaded - User: {context_data.get('user', {}).first_name if context_data.get('user') else 'None'}")
-        print(f"🔥 Streak: {context_data.get('current_streak', 0)}")
-        print(f"🚀 Phase: {context_data.get('execution_phase', 'unknown')}")
-        print(f"📈 Activities: {len(context_data.get('recent_activities', []))}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "📊 Context loaded - User: %s, streak: %s, phase: %s, activities: %s",
+                context_data['user'].first_name if context_data.get('user') else None,
+                context_data.get('current_streak', 0),
+                context_data.get('execution_phase', 'unknown'),
+                len(context_data.get('recent_activities', []))
+            )
         
-        # Generate AI-powered response
-        response = await self.gemini_coach.generate_response(message_text, context_data)
+        # Generate AI-powered response, streamed into a single message when Gemini is available
+        response, response_type = await self._reply(update, message_text, context_data)
         
-        # Determine response type and context tags
-        response_type = "gemini" if self.gemini_coach.enabled else "fallback"
         context_tags = self.analyze_message_context(message_text)
         
-        print(f"🤖 Response type: {response_type}")
-        print(f"📝 Response length: {len(response)} characters")
+        logger.debug("🤖 Response type: %s, length: %s characters", response_type, len(response))
+        
+        # Log conversation - written by the batched writer, off the reply path
+        await self.db.conversation_writer.put({
+            'user_id': user_id,
+            'message_text': message_text,
+            'bot_response': response,
+            'context_tags': context_tags,
+            'response_type': response_type
+        })
+    
+    async def fallback_reply(self, update: Update, message_text: str, context_data: Dict) -> Tuple[str, str]:
+        response = self.gemini_coach.fallback_response(message_text, context_data)
+        await update.message.reply_text(response)
+        return response, "fallback"
+    
+    async def stream_reply(self, update: Update, message_text: str, context_data: Dict) -> Tuple[str, str]:
+        """Send a placeholder and edit it as Gemini streams; returns (response, response_type)"""
+        reply = await update.message.reply_text("…")
+        text = ""
+        shown = ""
+        last_edit = 0.0
         
-        # Log conversation
-        session = self.db.get_session()
         try:
-            conversation = Conversation(
-                user_id=user_id,
-                message_text=message_text,
-                bot_response=response,
-                context_tags=context_tags,
-                response_type=response_type
-            )
-            session.add(conversation)
-            session.commit()
-        finally:
-            session.close()
+            async for chunk in self.gemini_coach.stream_response(message_text, context_data):
+                text += chunk
+                if not shown or len(text) - len(shown) >= self.STREAM_EDIT_MIN_CHARS:
+                    if time.monotonic() - last_edit >= self.STREAM_EDIT_INTERVAL:
+                        partial = text[:self.TELEGRAM_MESSAGE_LIMIT]
+                        if partial != shown and await self._edit_streamed(reply, partial):
+                            shown = partial
+                        last_edit = time.monotonic()
+        except Exception as e:
+            print(f"⚠️ Gemini streaming error: {e}")
+            print(f"🔍 Error type: {type(e).__name__}")
         
-        await update.message.reply_text(response)
+        response = text.strip()
+        response_type = "gemini"
+        if not response:
+            response = self.gemini_coach.fallback_response(message_text, context_data)
+            response_type = "fallback"
+        
+        # The placeholder holds the first part; anything past Telegram's limit follows as new messages
+        parts = split_message(response)
+        final = next(parts)
+        if final != shown:
+            wait = self.STREAM_EDIT_INTERVAL - (time.monotonic() - last_edit)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._edit_streamed(reply, final, retry=True)
+        for part in parts:
+            await update.message.reply_text(part)
+        return response, response_type
+    
+    async def _edit_streamed(self, reply, text: str, retry: bool = False) -> bool:
+        """Edit a streamed reply; failures are logged so they never cut the stream short"""
+        try:
+            await reply.edit_text(text)
+            return True
+        except RetryAfter as e:
+            if not retry:
+                print("⏳ Streamed edit rate limited, skipping this update")
+                return False
+            await asyncio.sleep(e.retry_after)
+            return await self._edit_streamed(reply, text)
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                return True
+            print(f"⚠️ Streamed edit failed: {e}")
+            return False
+        except TelegramError as e:
+            print(f"⚠️ Streamed edit failed: {e}")
+            return False
     
     def analyze_message_context(self, message: str) -> str:
         """Analyze message to tag context for future reference"""
-        message_lower = message.lower()
-        tags = []
-        
-        if any(word in message_lower for word in ['procrastinating', 'avoiding', 'stuck', 'overwhelmed']):
-            tags.append('procrastination')
-        
-        if any(word in message_lower for word in ['slow', 'frustrated', 'no results', 'impatient']):
-            tags.append('impatience')
-        
-        if any(word in message_lower for word in ['completed', 'finished', 'done', 'win', 'success']):
-            tags.append('win')
-        
-        if any(word in message_lower for word in ['customer', 'client', 'user', 'sale']):
-            tags.append('customer_related')
-        
-        if any(word in message_lower for word in ['money', 'revenue', 'funding', 'investment']):
-            tags.append('financial')
-        
+        tags = self._tag_matcher.match(message.lower())
         return ','.join(tags) if tags else 'general'
     
     async def handle_stuck(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         user_context = UserContext(self.db, user_id)
-        context_data = user_context.get_user_data()
+        context_data = await user_context.get_user_data()
         
         # Log stuck event
-        user_context.log_activity("User reported feeling stuck", "blocker", context_tags="procrastination,stuck")
+        activity = await user_context.log_activity("User reported feeling stuck", "blocker", context_tags="procrastination,stuck")
+        context_data = user_context.append_activity_in_memory(context_data, activity)
         
         # Generate specific unstuck response
         unstuck_message = "I'm feeling stuck and procrastinating. Please help me get unstuck with a specific 5-minute action I can take right now."
@@ -870,9 +1848,10 @@ Let's start! What's your current business idea or project?
         win_description = ' '.join(context.args) if context.args else "Achieved a win!"
         
         user_context = UserContext(self.db, user_id)
-        user_context.log_activity(win_description, "win", mood_score=4, context_tags="win,celebration")
+        context_data = await user_context.get_user_data()
         
-        context_data = user_context.get_user_data()
+        activity = await user_context.log_activity(win_description, "win", mood_score=4, context_tags="win,celebration")
+        context_data = user_context.append_activity_in_memory(context_data, activity)
         
         celebration_message = f"I just achieved a win: {win_description}. Please celebrate with me and help me build on this momentum!"
         response = await self.gemini_coach.generate_response(celebration_message, context_data)
@@ -880,9 +1859,11 @@ Let's start! What's your current business idea or project?
         await update.message.reply_text(f"🎉 Win Logged!\n\n{response}")
     
     async def show_progress(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # /progress replies; the weekly planning "Review Last Week" button replaces its menu
+        send = update.message.reply_text if update.message else update.callback_query.edit_message_text
+        
         user_id = update.effective_user.id
-        user_context = UserContext(self.db, user_id)
-        context_data = user_context.get_user_data()
+        context_data = await self.get_context(user_id)
         
         user = context_data.get('user')
         streak = context_data.get('current_streak', 0)
@@ -890,66 +1871,34 @@ Let's start! What's your current business idea or project?
         days_since_start = context_data.get('days_since_start', 0)
         recent_activities = context_data.get('recent_activities', [])
         
-        progress_msg = f"""
-📊 **Your Execution Progress**
-
-🔥 Current streak: **{streak} days**
-📈 Total actions: **{total_activities}**
-📅 Days as entrepreneur: **{days_since_start}**
-🚀 Phase: **{user.execution_phase.upper() if user else 'Not set'}**
-
-**Recent Activities:**
-"""
-        
         if recent_activities:
+            activity_lines = []
+            now = datetime.utcnow()
             for activity in recent_activities[:5]:
-                days_ago = (datetime.utcnow() - activity.timestamp).days
-                days_text = "today" if days_ago == 0 else f"{days_ago} days ago"
-                progress_msg += f"• {activity.description} ({days_text})\n"
+                days_ago = (now - activity.timestamp).days
+                days_text = "today" if days_ago == 0 else ("yesterday" if days_ago == 1 else f"{days_ago} days ago")
+                activity_lines.append(f"• {activity.description} ({days_text})\n")
+            activities = "".join(activity_lines)
         else:
-            progress_msg += "• No recent activities logged\n"
-        
-        progress_msg += f"\n💪 Keep building momentum! Every action counts."
+            activities = "• No recent activities logged\n"
+        
+        progress_msg = PROGRESS_TEMPLATE.format(
+            streak=streak,
+            total_activities=total_activities,
+            days_since_start=days_since_start,
+            phase=user.execution_phase.upper() if user else 'Not set',
+            activities=activities
+        )
         
-        await update.message.reply_text(progress_msg)
+        await send(progress_msg)
 
     async def show_agent_modes(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        modes_msg = """
-🤖 **Available Agent Modes**
-
-**🎯 EXECUTION COACH** (Default)
-*Helps with procrastination, goal-setting, and daily accountability*
-• Just send any message for coaching
-• /stuck - Get unstuck from procrastination
-• /win - Log victories and build momentum
-• /progress - See your streaks and patterns
-
-**💡 BUSINESS IDEAS GENERATOR**
-*Creates innovative, viable business concepts*
-• /ideas - Generate 3-5 creative business ideas
-• /ideas [theme] - Ideas focused on specific theme
-• Examples: `/ideas AI tools` or `/ideas local services`
-
-**📊 MARKET RESEARCHER**  
-*Provides competitive analysis and industry insights*
-• /research [topic] - Comprehensive market analysis
-• Examples: `/research food delivery apps` or `/research fitness wearables`
-
-**📋 PLANNING & GOALS**
-• /plan - Weekly planning session
-• /goal [description] - Set new goal
-• /idea [description] - Set business idea
-• /phase [planning|validation|mvp|traction] - Set execution phase
-
-All modes remember your history, goals, and patterns to provide personalized insights! 🧠
-        """
-        
-        await update.message.reply_text(modes_msg)
+        await update.message.reply_text(MODES_MSG)
     
     async def generate_business_ideas_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         user_context = UserContext(self.db, user_id)
-        context_data = user_context.get_user_data()
+        context_data = await user_context.get_user_data()
         
         # Get user request if provided
         user_request = ' '.join(context.args) if context.args else ""
@@ -961,17 +1910,13 @@ All modes remember your history, goals, and patterns to provide personalized ins
         ideas_response = await self.gemini_coach.generate_business_ideas(context_data, user_request)
         
         # Log this as an activity
-        user_context.log_activity("Generated business ideas", "planning", context_tags="business_ideas,brainstorming")
+        await user_context.log_activity("Generated business ideas", "planning", context_tags="business_ideas,brainstorming")
         
         final_response = f"💡 **Creative Business Ideas**\n\n{ideas_response}\n\n💪 Use /research [topic] to analyze any of these ideas further!"
         
         # Split long responses if needed
-        if len(final_response) > 4000:
-            parts = [final_response[i:i+4000] for i in range(0, len(final_response), 4000)]
-            for part in parts:
-                await update.message.reply_text(part)
-        else:
-            await update.message.reply_text(final_response)
+        for part in split_message(final_response):
+            await update.message.reply_text(part)
     
     async def test_gemini(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Test Gemini AI directly"""
@@ -982,9 +1927,8 @@ All modes remember your history, goals, and patterns to provide personalized ins
             return
         
         try:
-            # Simple test prompt
-            test_response = await asyncio.to_thread(
-                self.gemini_coach.model.generate_content, 
+            # Simple test prompt - sent straight to the API, bypassing the response cache
+            test_response = await self.gemini_coach.model.generate_content_async(
                 "Say 'Hello! Gemini AI is working correctly with model: " + getattr(self.gemini_coach, 'model_name', 'unknown') + "' and nothing else."
             )
             
@@ -999,31 +1943,24 @@ All modes remember your history, goals, and patterns to provide personalized ins
     async def debug_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show debug information"""
         user_id = update.effective_user.id
-        user_context = UserContext(self.db, user_id)
-        context_data = user_context.get_user_data()
+        context_data = await self.get_context(user_id)
         
-        debug_msg = f"""
-🔍 **Debug Information**
-
-**API Status:**
-• Gemini AI: {'✅ Enabled' if self.gemini_coach.enabled else '❌ Disabled'}
-• API Key Set: {'✅ Yes' if self.gemini_coach.api_key else '❌ No'}
-• Model Used: {getattr(self.gemini_coach, 'model_name', 'None')}
-
-**User Context:**
-• User ID: {user_id}
-• Name: {context_data.get('user', {}).first_name if context_data.get('user') else 'Unknown'}
-• Streak: {context_data.get('current_streak', 0)} days
-• Phase: {context_data.get('execution_phase', 'unknown')}
-• Total Activities: {context_data.get('total_activities', 0)}
-• Recent Activities: {len(context_data.get('recent_activities', []))}
-
-**Database:**
-• User Exists: {'✅ Yes' if context_data.get('user') else '❌ No'}
-• Goals: {len(context_data.get('active_goals', []))}
-
-Use /test to test Gemini AI directly.
-        """
+        user = context_data.get('user')
+        debug_msg = DEBUG_TEMPLATE.format(
+            gemini_status='✅ Enabled' if self.gemini_coach.enabled else '❌ Disabled',
+            api_key_status='✅ Yes' if self.gemini_coach.api_key else '❌ No',
+            model_name=getattr(self.gemini_coach, 'model_name', 'None'),
+            research_model=self.gemini_coach.research_model_name if self.gemini_coach.enabled else 'None',
+            user_id=user_id,
+            name=user.first_name if user else 'Unknown',
+            streak=context_data.get('current_streak', 0),
+            phase=context_data.get('execution_phase', 'unknown'),
+            total_activities=context_data.get('total_activities', 0),
+            recent_activities=len(context_data.get('recent_activities', [])),
+            user_exists='✅ Yes' if user else '❌ No',
+            goals=len(context_data.get('active_goals', [])),
+            pool_status=self.db.pool_status()
+        )
         
         await update.message.reply_text(debug_msg)
     
@@ -1042,7 +1979,7 @@ Use /test to test Gemini AI directly.
         
         user_id = update.effective_user.id
         user_context = UserContext(self.db, user_id)
-        context_data = user_context.get_user_data()
+        context_data = await user_context.get_user_data()
         
         research_topic = ' '.join(context.args)
         
@@ -1053,33 +1990,26 @@ Use /test to test Gemini AI directly.
         research_response = await self.gemini_coach.conduct_market_research(context_data, research_topic)
         
         # Log this as an activity
-        user_context.log_activity(f"Conducted market research on: {research_topic}", "research", context_tags="market_research,analysis")
+        await user_context.log_activity(f"Conducted market research on: {research_topic}", "research", context_tags="market_research,analysis")
         
         final_response = f"📊 **Market Research: {research_topic}**\n\n{research_response}\n\n💡 Want business ideas in this space? Try /ideas {research_topic}"
         
         # Split long responses if needed
-        if len(final_response) > 4000:
-            parts = [final_response[i:i+4000] for i in range(0, len(final_response), 4000)]
-            for part in parts:
-                await update.message.reply_text(part)
-        else:
-            await update.message.reply_text(final_response)
+        for part in split_message(final_response):
+            await update.message.reply_text(part)
     
     async def set_goal(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if context.args:
             goal_text = ' '.join(context.args)
-            session = self.db.get_session()
-            try:
+            async with self.db.session_scope(self.update_session(context)) as session:
                 goal = Goal(
                     user_id=update.effective_user.id,
                     title=goal_text,
                     goal_type='general'
                 )
                 session.add(goal)
-                session.commit()
-                await update.message.reply_text(f"🎯 Goal set: {goal_text}\n\nWhat's the first small step toward this goal?")
-            finally:
-                session.close()
+            user_data_cache.invalidate(update.effective_user.id)
+            await update.message.reply_text(f"🎯 Goal set: {goal_text}\n\nWhat's the first small step toward this goal?")
         else:
             await update.message.reply_text("Usage: /goal Your goal description")
     
@@ -1100,111 +2030,148 @@ Use /test to test Gemini AI directly.
         query = update.callback_query
         await query.answer()
         
+        # Only the review needs the user's context; the other buttons just swap the text
         if query.data == "plan_tasks":
             await query.edit_message_text("📋 List your 3 must-do tasks for this week (one per message):")
-        elif query.data == "plan_review":
-            await self.show_progress(update, context)
         elif query.data == "plan_goal":
             await query.edit_message_text("🎯 Use /goal to set your weekly goal!")
+        elif query.data == "plan_review":
+            await self.show_progress(update, context)
     
     async def daily_checkin(self):
-        """Scheduled daily check-in for all users"""
-        session = self.db.get_session()
+        """Scheduled daily check-in for the users due this minute.
+        
+        Users are checked in during the hour of their preferred_checkin_time
+        (UTC), spread over that hour by telegram_id % 60 so the whole user
+        base isn't messaged in the same second. The schedule lives in the
+        users table, so nothing is lost on restart.
+        """
         try:
+            now = datetime.utcnow()
             # Only check in with users who've been active in the last 7 days
-            week_ago = datetime.utcnow() - timedelta(days=7)
-            active_users = session.query(User).filter(User.last_active > week_ago).all()
+            week_ago = now - timedelta(days=7)
+            # One query for every due user, streaks included - no per-user context loads
+            async with self.db.read_pool.acquire() as conn:
+                active_users = await self.db.fetch(
+                    conn, CHECKIN_USERS_QUERY,
+                    week_ago, datetime.now().date(), STREAK_LOOKBACK_DAYS, f"{now.hour:02d}", now.minute
+                )
             
-            for user in active_users:
-                try:
-                    user_context = UserContext(self.db, user.telegram_id)
-                    context_data = user_context.get_user_data()
-                    
-                    checkin_msg = f"""
-🌅 **Daily Check-in Time!** 
-
-Hey {user.first_name}! 
-
-Current streak: **{context_data['current_streak']} days**
-Phase: **{context_data['execution_phase'].upper()}**
-
-What's your 5-minute action for today? Even tiny progress counts in the {context_data['execution_phase']} phase!
-
-Reply with what you accomplished or use /stuck if you're feeling blocked. 💪
-                    """
-                    
-                    await self.app.bot.send_message(
-                        chat_id=user.telegram_id,
-                        text=checkin_msg
-                    )
-                except Exception as e:
-                    print(f"Failed to send daily checkin to user {user.telegram_id}: {e}")
-                    
+            await self.broadcast([self._send_checkin(user) for user in active_users])
         except Exception as e:
             print(f"Error in daily_checkin: {e}")
-        finally:
-            session.close()
+    
+    async def _send_checkin(self, user: asyncpg.Record):
+        try:
+            checkin_msg = render_checkin_message(
+                user['first_name'], user['execution_phase'], user['current_streak']
+            )
+            await self.app.bot.send_message(
+                chat_id=user['telegram_id'],
+                text=checkin_msg
+            )
+        except Exception as e:
+            print(f"Failed to send daily checkin to user {user['telegram_id']}: {e}")
+    
+    async def broadcast(self, sends: List):
+        """Run scheduled sends concurrently, at most BROADCAST_CONCURRENCY at a time"""
+        semaphore = asyncio.Semaphore(self.BROADCAST_CONCURRENCY)
+        
+        async def bounded(send):
+            async with semaphore:
+                await send
+        
+        await asyncio.gather(*(bounded(send) for send in sends))
     
     async def weekly_planning_reminder(self):
         """Scheduled weekly planning reminder"""
-        session = self.db.get_session()
         try:
             week_ago = datetime.utcnow() - timedelta(days=7)
-            active_users = session.query(User).filter(User.last_active > week_ago).all()
+            async with self.db.session_scope() as session:
+                active_user_ids = (await session.execute(
+                    select(User.telegram_id).filter(User.last_active > week_ago)
+                )).scalars().all()
             
-            for user in active_users:
-                try:
-                    await self.app.bot.send_message(
-                        chat_id=user.telegram_id,
-                        text="📅 **Weekly Planning Time!**\n\nUse /plan to set up your week for execution success! 🚀"
-                    )
-                except Exception as e:
-                    print(f"Failed to send weekly reminder to user {user.telegram_id}: {e}")
+            await self.broadcast([self._send_weekly_reminder(telegram_id) for telegram_id in active_user_ids])
         except Exception as e:
             print(f"Error in weekly_planning_reminder: {e}")
-        finally:
-            session.close()
     
-    def run(self):
+    async def _send_weekly_reminder(self, telegram_id: int):
+        try:
+            await self.app.bot.send_message(
+                chat_id=telegram_id,
+                text="📅 **Weekly Planning Time!**\n\nUse /plan to set up your week for execution success! 🚀"
+            )
+        except Exception as e:
+            print(f"Failed to send weekly reminder to user {telegram_id}: {e}")
+    
+    def run(self, port: int = 10000):
         """Start the bot and scheduler"""
-        self.scheduler.start()
-        print("⏰ Scheduler started - daily check-ins and weekly reminders active")
-        
-        # Start port binding for Render (required for web services)
-        self.start_port_binding()
-        
-        # Start bot polling
-        self.app.run_polling()
-    
-    def start_port_binding(self):
-        """Bind to port to satisfy Render web service requirements"""
-        import threading
-        from http.server import HTTPServer, BaseHTTPRequestHandler
-        
-        class HealthHandler(BaseHTTPRequestHandler):
-            def do_GET(self):
-                if self.path == '/health':
-                    self.send_response(200)
-                    self.send_header('Content-type', 'text/plain')
-                    self.end_headers()
-                    self.wfile.write(b'Bot is running')
-                else:
-                    self.send_response(404)
-                    self.end_headers()
-            
-            def log_message(self, format, *args):
-                # Suppress HTTP server logs
-                pass
-        
-        def run_server():
-            port = int(os.getenv('PORT', 10000))
-            server = HTTPServer(('0.0.0.0', port), HealthHandler)
-            print(f"🌐 Health server started on port {port}")
-            server.serve_forever()
+        asyncio.run(self.serve(port))
+    
+    async def serve(self, port: int):
+        """Run the bot, scheduler and web server on one event loop.
         
-        # Run HTTP server in background thread
-        server_thread = threading.Thread(target=run_server, daemon=True)
-        server_thread.start()
+        The aiohttp server always answers /health (Render needs the port
+        bound); in webhook mode it also receives Telegram updates, otherwise
+        the updater long-polls.
+        """
+        web_app = web.Application()
+        web_app.router.add_get('/health', self.handle_health)
+        if self.webhook_url:
+            web_app.router.add_post(self.WEBHOOK_PATH, self.handle_webhook)
+        runner = web.AppRunner(web_app, access_log=None)
+        await runner.setup()
+        
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        
+        # serve() drives the Application itself, so these aren't registered as builder hooks
+        await self.app.initialize()
+        await self.post_init(self.app)
+        try:
+            if self.webhook_url:
+                await self.app.bot.set_webhook(
+                    url=f"{self.webhook_url.rstrip('/')}{self.WEBHOOK_PATH}",
+                    secret_token=self.webhook_secret,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            await self.app.start()
+            await web.TCPSite(runner, '0.0.0.0', port).start()
+            if self.webhook_url:
+                print(f"🌐 Webhook server listening on port {port}")
+            else:
+                # Removes any webhook left over from webhook mode before polling
+                await self.app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+                print(f"🌐 Health server started on port {port}, polling for updates")
+            
+            self.scheduler.start()
+            print("⏰ Scheduler started - daily check-ins and weekly reminders active")
+            
+            await stop_event.wait()
+            print("🛑 Shutting down gracefully...")
+        finally:
+            if self.scheduler.running:
+                self.scheduler.shutdown(wait=False)
+            await runner.cleanup()
+            if self.app.updater and self.app.updater.running:
+                await self.app.updater.stop()
+            if self.app.running:
+                await self.app.stop()
+            await self.app.shutdown()
+            await self.post_shutdown(self.app)
+    
+    async def handle_webhook(self, request: web.Request) -> web.Response:
+        if request.headers.get('X-Telegram-Bot-Api-Secret-Token') != self.webhook_secret:
+            return web.Response(status=403)
+        update = Update.de_json(await request.json(), self.app.bot)
+        await self.app.update_queue.put(update)
+        return web.Response()
+    
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.Response(text='Bot is running')
 
 # Main execution
 if __name__ == "__main__":
@@ -1215,6 +2182,11 @@ if __name__ == "__main__":
     
     print("🚀 Execution Coach Bot with Gemini AI starting...")
     
+    # Must be set before the scheduler and PTB create the event loop
+    if UVLOOP_AVAILABLE:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        print("⚡ Using uvloop event loop")
+    
     config = RenderConfig()
     config.validate()
     
@@ -1231,15 +2203,21 @@ if __name__ == "__main__":
         bot = ExecutionCoachBot(
             config.TELEGRAM_TOKEN, 
             config.DATABASE_URL, 
-            config.GEMINI_API_KEY
+            config.GEMINI_API_KEY,
+            config.GEMINI_MODEL,
+            config.GEMINI_RESEARCH_MODEL,
+            config.RUN_SCHEMA_CHECK,
+            config.DB_OPTIONS,
+            config.WEBHOOK_URL,
+            config.WEBHOOK_SECRET
         )
         
         print("🤖 Bot initialized successfully")
-        print("📊 Database tables created")
+        print(f"📊 Database schema check: {'✅ Enabled' if config.RUN_SCHEMA_CHECK else 'skipped (managed by Alembic)'}")
         print("⏰ Scheduler activated")
-        print("🌐 Starting polling...")
+        print(f"🌐 Starting {'webhook' if config.WEBHOOK_URL else 'polling'}...")
         
-        bot.run()
+        bot.run(config.PORT)
         
     except Exception as e:
         print(f"❌ Failed to start bot: {e}")
@@ -0,0 +1,52 @@
+# Alembic environment for the Execution Coach Bot (async engine, asyncpg driver)
+
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from bot import Base, RenderConfig, engine_connect_args
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def get_url() -> str:
+    # Same DATABASE_URL normalization the bot uses (postgres:// -> postgresql+asyncpg://)
+    return RenderConfig().DATABASE_URL
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout instead of connecting (alembic upgrade head --sql)"""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online():
+    pgbouncer = RenderConfig().DB_OPTIONS['pgbouncer']
+    engine = create_async_engine(get_url(), connect_args=engine_connect_args(pgbouncer))
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,129 @@
+"""Baseline schema: BigInteger Telegram ids and per-user indexes
+
+Fresh databases get every table. Databases created by the bot before
+migrations existed keep their data: integer id columns are widened to
+BIGINT and the per-user indexes are built concurrently.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (table, column) pairs holding Telegram ids, which overflow INTEGER
+TELEGRAM_ID_COLUMNS = [
+    ('users', 'telegram_id'),
+    ('goals', 'user_id'),
+    ('activities', 'user_id'),
+    ('progress', 'user_id'),
+    ('conversations', 'user_id'),
+]
+
+INDEXES = [
+    ('ix_goals_user_status_priority', 'goals', ['user_id', 'status', sa.text('priority DESC')], {}),
+    ('ix_activities_user_ts', 'activities', ['user_id', sa.text('timestamp DESC')],
+     {'postgresql_include': ['description', 'activity_type']}),
+    ('ix_conversations_user_ts', 'conversations', ['user_id', sa.text('timestamp DESC')], {}),
+]
+
+
+def create_tables(existing):
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('telegram_id', sa.BigInteger, unique=True, nullable=False),
+            sa.Column('username', sa.String(50)),
+            sa.Column('first_name', sa.String(50)),
+            sa.Column('current_business_idea', sa.Text),
+            sa.Column('execution_phase', sa.String(20)),
+            sa.Column('created_at', sa.DateTime),
+            sa.Column('timezone', sa.String(50)),
+            sa.Column('preferred_checkin_time', sa.String(5)),
+            sa.Column('total_activities', sa.Integer),
+            sa.Column('last_active', sa.DateTime),
+        )
+    if 'goals' not in existing:
+        op.create_table(
+            'goals',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('user_id', sa.BigInteger, nullable=False),
+            sa.Column('title', sa.String(200), nullable=False),
+            sa.Column('description', sa.Text),
+            sa.Column('target_date', sa.DateTime),
+            sa.Column('status', sa.String(20)),
+            sa.Column('created_at', sa.DateTime),
+            sa.Column('goal_type', sa.String(20)),
+            sa.Column('priority', sa.Integer),
+        )
+    if 'activities' not in existing:
+        op.create_table(
+            'activities',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('user_id', sa.BigInteger, nullable=False),
+            sa.Column('goal_id', sa.Integer),
+            sa.Column('description', sa.Text, nullable=False),
+            sa.Column('activity_type', sa.String(50)),
+            sa.Column('timestamp', sa.DateTime),
+            sa.Column('mood_score', sa.Integer),
+            sa.Column('notes', sa.Text),
+            sa.Column('context_tags', sa.String(200)),
+        )
+    if 'progress' not in existing:
+        op.create_table(
+            'progress',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('user_id', sa.BigInteger, nullable=False),
+            sa.Column('metric_name', sa.String(100)),
+            sa.Column('metric_value', sa.Float),
+            sa.Column('date_recorded', sa.DateTime),
+            sa.Column('notes', sa.Text),
+        )
+    if 'conversations' not in existing:
+        op.create_table(
+            'conversations',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('user_id', sa.BigInteger, nullable=False),
+            sa.Column('message_text', sa.Text),
+            sa.Column('bot_response', sa.Text),
+            sa.Column('context_tags', sa.String(200)),
+            sa.Column('timestamp', sa.DateTime),
+            sa.Column('response_type', sa.String(50)),
+        )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+    
+    # Widen id columns on tables created with INTEGER (keeps the rows, unlike the old drop_all)
+    for table, column in TELEGRAM_ID_COLUMNS:
+        if table not in existing:
+            continue
+        for col in inspector.get_columns(table):
+            if col['name'] == column and not isinstance(col['type'], sa.BigInteger):
+                op.alter_column(table, column, type_=sa.BigInteger(), existing_type=col['type'])
+    
+    create_tables(existing)
+    
+    # Build indexes without locking writes on tables that already hold data
+    for name, table, columns, kwargs in INDEXES:
+        if table in existing:
+            if name in {index['name'] for index in inspector.get_indexes(table)}:
+                continue
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+        else:
+            op.create_index(name, table, columns, **kwargs)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
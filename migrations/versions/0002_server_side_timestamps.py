@@ -0,0 +1,38 @@
+"""Server-side UTC defaults for timestamp columns
+
+Postgres stamps created/activity times instead of the bot sending
+datetime.utcnow() with every INSERT. Columns stay timezone-naive UTC.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+UTC_NOW = sa.text("timezone('utc', now())")
+
+TIMESTAMP_COLUMNS = [
+    ('users', 'created_at'),
+    ('users', 'last_active'),
+    ('goals', 'created_at'),
+    ('activities', 'timestamp'),
+    ('progress', 'date_recorded'),
+    ('conversations', 'timestamp'),
+]
+
+
+def upgrade():
+    for table, column in TIMESTAMP_COLUMNS:
+        op.alter_column(table, column, server_default=UTC_NOW, existing_type=sa.DateTime())
+
+
+def downgrade():
+    for table, column in TIMESTAMP_COLUMNS:
+        op.alter_column(table, column, server_default=None, existing_type=sa.DateTime())
@@ -0,0 +1,34 @@
+"""Index for the per-minute check-in cohort query
+
+daily_checkin runs every minute and selects users by check-in hour,
+telegram_id % 60 and last_active; without this index every run scans
+the whole users table. Built concurrently.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Must match the expressions in CHECKIN_USERS_QUERY for the planner to use it
+CHECKIN_SLOT_COLUMNS = [
+    sa.text("substr(COALESCE(preferred_checkin_time, '18:00'), 1, 2)"),
+    sa.text('(telegram_id % 60)'),
+    'last_active',
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_checkin_slot', 'users', CHECKIN_SLOT_COLUMNS, postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_users_checkin_slot', table_name='users')
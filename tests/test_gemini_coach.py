@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+from cachetools import TTLCache
+
+import bot
+
+
+class FakeModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls += 1
+        if not stream:
+            await asyncio.sleep(0.01)
+            return SimpleNamespace(text=''.join(self.chunks))
+        return self._stream()
+
+    async def _stream(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0.01)
+            yield SimpleNamespace(text=chunk)
+
+
+def make_coach():
+    coach = bot.GeminiCoach.__new__(bot.GeminiCoach)
+    coach._semaphore = asyncio.Semaphore(coach.MAX_CONCURRENT_REQUESTS)
+    coach._response_cache = TTLCache(maxsize=16, ttl=60)
+    coach._inflight = {}
+    return coach
+
+
+async def collect(stream):
+    return ''.join([chunk async for chunk in stream])
+
+
+def test_identical_streamed_prompts_share_one_call():
+    async def scenario():
+        coach = make_coach()
+        model = FakeModel(['Ship ', 'one ', 'thing.'])
+        results = await asyncio.gather(
+            collect(coach._generate_stream(model, 'prompt')),
+            collect(coach._generate_stream(model, 'prompt')),
+            coach._generate(model, 'prompt'),
+        )
+        return coach, model, results
+
+    coach, model, results = asyncio.run(scenario())
+
+    assert model.calls == 1
+    assert results == ['Ship one thing.'] * 3
+    assert coach._inflight == {}
+    assert list(coach._response_cache.values()) == ['Ship one thing.']
+
+
+def test_cancelled_reader_does_not_stop_the_shared_call():
+    async def scenario():
+        coach = make_coach()
+        model = FakeModel(['a', 'b', 'c'])
+        first = asyncio.create_task(collect(coach._generate_stream(model, 'prompt')))
+        second = asyncio.create_task(collect(coach._generate_stream(model, 'prompt')))
+        await asyncio.sleep(0.015)
+        first.cancel()
+        return model, await second
+
+    model, text = asyncio.run(scenario())
+
+    assert model.calls == 1
+    assert text == 'abc'
+
+
+def test_errors_reach_every_reader():
+    class BrokenModel:
+        async def generate_content_async(self, prompt, stream=False):
+            await asyncio.sleep(0.01)
+            raise ValueError('blocked')
+
+    async def scenario():
+        coach = make_coach()
+        model = BrokenModel()
+        return coach, await asyncio.gather(
+            coach._generate(model, 'prompt'),
+            collect(coach._generate_stream(model, 'prompt')),
+            return_exceptions=True,
+        )
+
+    coach, results = asyncio.run(scenario())
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert coach._inflight == {}
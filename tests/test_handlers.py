@@ -0,0 +1,127 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.sql.dml import Update as UpdateStatement
+
+import bot
+
+
+class FakeDatabase:
+    def __init__(self, returned_id):
+        self.session = MagicMock()
+        self.session.scalar = AsyncMock(return_value=returned_id)
+
+    @asynccontextmanager
+    async def session_scope(self, session=None):
+        yield self.session
+
+
+def make_bot(returned_id):
+    coach = bot.ExecutionCoachBot.__new__(bot.ExecutionCoachBot)
+    coach.db = FakeDatabase(returned_id)
+    return coach
+
+
+def make_update(user_id=42):
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id),
+        message=SimpleNamespace(reply_text=AsyncMock()),
+    )
+
+
+def make_context(*args):
+    return SimpleNamespace(args=list(args), chat_data={})
+
+
+def sent_statement(coach):
+    statement = coach.db.session.scalar.await_args.args[0]
+    assert isinstance(statement, UpdateStatement)
+    assert statement.table.name == 'users'
+    return statement.compile().params
+
+
+def test_set_business_idea_updates_user():
+    coach = make_bot(returned_id=1)
+    update = make_update()
+
+    asyncio.run(coach.set_business_idea(update, make_context('AI', 'bookkeeping')))
+
+    params = sent_statement(coach)
+    assert params['current_business_idea'] == 'AI bookkeeping'
+    assert params['telegram_id_1'] == 42
+    assert 'Business idea set: AI bookkeeping' in update.message.reply_text.await_args.args[0]
+
+
+def test_set_business_idea_unknown_user():
+    coach = make_bot(returned_id=None)
+    update = make_update()
+
+    asyncio.run(coach.set_business_idea(update, make_context('anything')))
+
+    assert '/start' in update.message.reply_text.await_args.args[0]
+
+
+@pytest.mark.parametrize('phase', sorted(bot.VALID_PHASES))
+def test_set_phase_updates_user(phase):
+    coach = make_bot(returned_id=1)
+    update = make_update()
+
+    asyncio.run(coach.set_phase(update, make_context(phase.upper())))
+
+    params = sent_statement(coach)
+    assert params['execution_phase'] == phase
+    assert phase.upper() in update.message.reply_text.await_args.args[0]
+
+
+def test_set_phase_rejects_unknown_phase():
+    coach = make_bot(returned_id=1)
+    update = make_update()
+
+    asyncio.run(coach.set_phase(update, make_context('scaling')))
+
+    coach.db.session.scalar.assert_not_awaited()
+    update.message.reply_text.assert_awaited_once_with(bot.VALID_PHASES_MSG)
+
+
+def test_stream_reply_survives_failed_edits():
+    from telegram.error import TimedOut
+
+    async def stream(message_text, context_data):
+        for chunk in ('first part ', 'second part ', 'third part'):
+            yield chunk
+
+    coach = bot.ExecutionCoachBot.__new__(bot.ExecutionCoachBot)
+    coach.STREAM_EDIT_INTERVAL = 0
+    coach.STREAM_EDIT_MIN_CHARS = 1
+    coach.gemini_coach = SimpleNamespace(stream_response=stream)
+    reply = SimpleNamespace(edit_text=AsyncMock(side_effect=[TimedOut(), None, None]))
+    update = make_update()
+    update.message.reply_text.return_value = reply
+
+    response, response_type = asyncio.run(coach.stream_reply(update, 'hello', {}))
+
+    assert (response, response_type) == ('first part second part third part', 'gemini')
+    assert reply.edit_text.await_args.args[0] == 'first part second part third part'
+
+
+def test_stream_reply_sends_overflow_as_follow_up_messages():
+    long_reply = 'x' * 3000 + '\n' + 'y' * 3000
+
+    async def stream(message_text, context_data):
+        yield long_reply
+
+    coach = bot.ExecutionCoachBot.__new__(bot.ExecutionCoachBot)
+    coach.STREAM_EDIT_INTERVAL = 0
+    coach.gemini_coach = SimpleNamespace(stream_response=stream)
+    reply = SimpleNamespace(edit_text=AsyncMock())
+    update = make_update()
+    update.message.reply_text.return_value = reply
+
+    response, _ = asyncio.run(coach.stream_reply(update, 'hello', {}))
+
+    assert response == long_reply
+    assert reply.edit_text.await_args.args[0] == 'x' * 3000
+    assert update.message.reply_text.await_args.args[0] == 'y' * 3000
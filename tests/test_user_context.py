@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import bot
+
+
+def activity(row_id, timestamp):
+    return bot.ActivityRow(row_id, f'activity {row_id}', 'progress', timestamp)
+
+
+def test_fetch_history_uses_newest_id_when_timestamps_tie():
+    batch_time = datetime(2024, 1, 1, 12, 0)
+    # One batch flush: same timestamp, in RECENT_ACTIVITIES_QUERY order (timestamp DESC, id DESC)
+    previous = [activity(3, batch_time), activity(2, batch_time), activity(1, batch_time)]
+    new_row = (4, 'activity 4', 'progress', datetime(2024, 1, 1, 12, 5))
+    db = MagicMock()
+    db.fetch = AsyncMock(return_value=[new_row])
+    user_context = bot.UserContext(db, user_id=42)
+
+    rows = asyncio.run(user_context._fetch_history(
+        None, bot.ActivityRow, previous,
+        bot.RECENT_ACTIVITIES_QUERY, bot.NEW_ACTIVITIES_QUERY, limit=20,
+    ))
+
+    assert db.fetch.await_args.args[1:] == (bot.NEW_ACTIVITIES_QUERY, 42, 3)
+    assert [row.id for row in rows] == [4, 3, 2, 1]
+
+
+def context_data(last_checkin, current_streak, streak_through_yesterday):
+    return {
+        'user': None,
+        'recent_activities': [],
+        'active_goals': [],
+        'recent_conversations': [],
+        'last_checkin': last_checkin,
+        'current_streak': current_streak,
+        'streak_through_yesterday': streak_through_yesterday,
+        'total_activities': 7,
+    }
+
+
+def test_first_activity_today_extends_yesterdays_streak():
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    data = context_data(yesterday, current_streak=0, streak_through_yesterday=4)
+    user_context = bot.UserContext(MagicMock(), user_id=42)
+
+    updated = user_context.append_activity_in_memory(data, {'description': 'shipped', 'activity_type': 'win'})
+
+    assert updated['current_streak'] == 5
+    assert updated['total_activities'] == 8
+
+
+def test_another_activity_today_keeps_the_streak():
+    data = context_data(datetime.utcnow(), current_streak=3, streak_through_yesterday=0)
+    user_context = bot.UserContext(MagicMock(), user_id=42)
+
+    updated = user_context.append_activity_in_memory(data, {'description': 'shipped', 'activity_type': 'win'})
+
+    assert updated['current_streak'] == 3
@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.sql.dml import Insert as InsertStatement, Update as UpdateStatement
+
+import bot
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.session = MagicMock()
+        self.session.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def session_scope(self, session=None):
+        yield self.session
+
+
+def test_activity_flush_inserts_rows_and_bumps_totals():
+    db = FakeDatabase()
+    writer = bot.ActivityWriter(db)
+    rows = [
+        {'user_id': 1, 'description': 'shipped', 'activity_type': 'win'},
+        {'user_id': 1, 'description': 'called a customer', 'activity_type': 'progress'},
+        {'user_id': 2, 'description': 'stuck', 'activity_type': 'blocker'},
+    ]
+
+    asyncio.run(writer._flush(rows))
+
+    (insert_call, update_call) = db.session.execute.await_args_list
+    statement, params = insert_call.args
+    assert isinstance(statement, InsertStatement)
+    assert statement.table.name == 'activities'
+    assert params == rows
+
+    statement, params = update_call.args
+    assert isinstance(statement, UpdateStatement)
+    assert statement.table.name == 'users'
+    assert sorted(params, key=lambda p: p['tid']) == [{'tid': 1, 'n': 2}, {'tid': 2, 'n': 1}]
+
+
+def test_batch_is_retried_after_a_transient_error():
+    from sqlalchemy.exc import OperationalError
+
+    writer = bot.WriteBatcher(FakeDatabase(), bot.Conversation)
+    writer.FLUSH_RETRY_DELAY = 0
+    writer._flush = AsyncMock(side_effect=[OperationalError('INSERT', {}, Exception('connection reset')), None])
+    rows = [{'user_id': 1, 'message_text': 'hi', 'bot_response': 'hello'}]
+
+    asyncio.run(writer._write(rows))
+
+    assert writer._flush.await_count == 2
+
+
+def test_batch_is_dropped_and_logged_on_other_errors(caplog):
+    writer = bot.WriteBatcher(FakeDatabase(), bot.Conversation)
+    writer._flush = AsyncMock(side_effect=NameError('boom'))
+
+    asyncio.run(writer._write([{'user_id': 1}]))
+
+    assert writer._flush.await_count == 1
+    assert 'Dropping 1 conversations rows' in caplog.text
+    assert 'NameError' in caplog.text